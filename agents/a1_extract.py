@@ -1,50 +1,199 @@
-import os, uuid, zipfile, requests, pdfplumber, docx, pandas as pd
+import os, uuid, threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.docstore import DocStore, DocstoreView, file_digest
+from utils.download import discard_partial, download, partial_files
+from utils.extract_zip import extract_selected
 
-def download_and_extract(url, upload_dir):
-    job_id = str(uuid.uuid4())
+PAGES_PER_TASK = 25
+EXTRACTABLE = (".docx", ".pdf", ".xlsx")
+MAX_MEMBER_BYTES = int(os.environ.get("MAX_MEMBER_MB", "200")) * 1024 * 1024
+# pdfplumber, python-docx et pandas sont importés à la première extraction (démarrage à froid)
+# PDF ouvert par le processus (ou le thread, en extraction séquentielle) de travail courant
+_worker = threading.local()
+
+@lru_cache(maxsize=1)
+def extractor_version():
+    """Version des extractions persistées ; à incrémenter dès que le texte produit change."""
+    import pdfplumber
+    return f"a1.2/pdfplumber-{pdfplumber.__version__}"
+
+def _download_path(upload_dir, job_id):
+    return os.path.join(upload_dir, f"dl-{job_id}.zip")
+
+def download_files(job_id):
+    """Noms (relatifs à upload_dir) des fichiers d'un téléchargement inachevé du job."""
+    return [os.path.basename(p) for p in partial_files(_download_path("", job_id))]
+
+def download_and_extract(url, upload_dir, job_id=None, sha256=None):
+    """Télécharge le ZIP (reprise sur coupure, taille plafonnée, SHA-256 optionnel) puis n'en
+    extrait que les fichiers exploitables. Le .part est propre au job ; il est supprimé si le
+    téléchargement échoue définitivement (les reprises ont lieu pendant les tentatives)."""
+    job_id = job_id or str(uuid.uuid4())
     local_zip = os.path.join(upload_dir, f"{job_id}.zip")
     extract_dir = os.path.join(upload_dir, job_id)
     os.makedirs(extract_dir, exist_ok=True)
 
-    r = requests.get(url, stream=True)
-    with open(local_zip, "wb") as f:
-        for chunk in r.iter_content(chunk_size=8192):
-            f.write(chunk)
+    partial = _download_path(upload_dir, job_id)
+    try:
+        download(url, partial, sha256=sha256)
+    except BaseException:
+        discard_partial(partial)
+        raise
+    os.replace(partial, local_zip)
 
-    with zipfile.ZipFile(local_zip, 'r') as zip_ref:
-        zip_ref.extractall(extract_dir)
+    extract_selected(local_zip, extract_dir, keep=lambda name: name.lower().endswith(EXTRACTABLE),
+                     max_member_bytes=MAX_MEMBER_BYTES)
+    return job_id, list_files(extract_dir)
 
-    return job_id, os.listdir(extract_dir)
+def list_files(path):
+    """Fichiers du job, sous-dossiers compris (l'arborescence du ZIP est conservée à l'extraction),
+    en chemins relatifs au format « DCE/02_CCTP.pdf », triés."""
+    out = []
+    for root, dirs, files in os.walk(path):
+        rel = os.path.relpath(root, path)
+        out.extend(f if rel == "." else "/".join(rel.split(os.sep) + [f]) for f in files)
+    return sorted(out)
 
 def read_docx(path):
+    import docx
     doc = docx.Document(path)
     return "\n".join([p.text for p in doc.paragraphs])
 
+def read_pdf_pages(path, start=0, stop=None):
+    """(n° de page à partir de 1, texte) pour les pages [start, stop), pages vides exclues."""
+    import pdfplumber
+    only = list(range(start + 1, stop + 1)) if stop is not None else None
+    with pdfplumber.open(path, pages=only) as pdf:
+        return _page_texts(pdf.pages if only else pdf.pages[start:])
+
+def _page_texts(pages):
+    out = []
+    for page in pages:
+        txt = page.extract_text()
+        n = page.page_number
+        page.close()
+        if txt: out.append((n, txt))
+    return out
+
+def _worker_pdf(path):
+    """PDF ouvert une fois par processus de travail : les tranches suivantes du même fichier
+    réutilisent l'arbre des pages déjà lu au lieu de réanalyser tout le document."""
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    cached = getattr(_worker, "pdf", None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    _close_worker_pdf()
+    import pdfplumber
+    pdf = pdfplumber.open(path)
+    _worker.pdf = (key, pdf)
+    return pdf
+
+def _close_worker_pdf():
+    cached = getattr(_worker, "pdf", None)
+    if cached is not None:
+        _worker.pdf = None
+        cached[1].close()
+
 def read_pdf(path):
-    text = ""
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            txt = page.extract_text()
-            if txt: text += txt + "\n"
-    return text
+    return "".join(txt + "\n" for _, txt in read_pdf_pages(path))
 
 def read_excel(path):
+    import pandas as pd
     df = pd.read_excel(path)
     return df.to_dict(orient="records")
 
-def build_docstore(job_id, upload_dir="uploads"):
-    path = os.path.join(upload_dir, job_id)
-    doc_text, tables = "", []
-    files = []
+def _pdf_page_count(path):
+    """Nombre de pages lu dans le catalogue (/Count), sans parcourir l'arbre des pages."""
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+    try:
+        with open(path, "rb") as f:
+            count = resolve1(resolve1(PDFDocument(PDFParser(f)).catalog["Pages"])["Count"])
+        if isinstance(count, int) and count >= 0:
+            return count
+    except Exception:
+        pass
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
 
-    for file in os.listdir(path):
+def _extract_task(fpath, start, stop):
+    if fpath.endswith(".docx"):
+        return [(1, read_docx(fpath))]
+    if fpath.endswith(".pdf"):
+        return _page_texts(_worker_pdf(fpath).pages[start:stop])
+    return read_excel(fpath)
+
+def _plan_tasks(path, files):
+    tasks = []
+    for file in files:
         fpath = os.path.join(path, file)
-        files.append(file)
-        if file.endswith(".docx"):
-            doc_text += read_docx(fpath) + "\n"
-        elif file.endswith(".pdf"):
-            doc_text += read_pdf(fpath) + "\n"
-        elif file.endswith(".xlsx"):
-            tables.extend(read_excel(fpath))
-
-    return {"files": files, "doc_text": doc_text, "tables": tables}
+        if file.endswith(".pdf"):
+            n = _pdf_page_count(fpath)
+            tasks.extend((file, fpath, s, min(s + PAGES_PER_TASK, n)) for s in range(0, n, PAGES_PER_TASK))
+        elif file.endswith(EXTRACTABLE):
+            tasks.append((file, fpath, 0, None))
+    return tasks
+
+def iter_extract(job_id, upload_dir="uploads", workers=None, files=None):
+    """Génère (fichier, page, texte) au fil de l'extraction, dans l'ordre d'achèvement.
+
+    Les PDF sont découpés en tranches de PAGES_PER_TASK pages réparties sur un pool de
+    processus (workers=1 : extraction séquentielle dans le processus courant) ; chaque
+    processus n'ouvre un PDF qu'une fois pour toutes ses tranches. Les .xlsx produisent
+    (fichier, None, enregistrements). `files` restreint l'extraction à ces noms.
+    """
+    path = os.path.join(upload_dir, job_id)
+    tasks = _plan_tasks(path, list_files(path) if files is None else files)
+    if not tasks:
+        return
+    if workers == 1:
+        try:
+            for file, fpath, start, stop in tasks:
+                yield from _as_chunks(file, _extract_task(fpath, start, stop))
+        finally:
+            _close_worker_pdf()
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futs = {ex.submit(_extract_task, fpath, start, stop): file for file, fpath, start, stop in tasks}
+        for fut in as_completed(futs):
+            yield from _as_chunks(futs[fut], fut.result())
+
+def _as_chunks(file, result):
+    if file.endswith(".xlsx"):
+        yield file, None, result
+    else:
+        for page, txt in result:
+            yield file, page, txt
+
+def build_docstore(job_id, upload_dir="uploads", workers=None, store=None):
+    """Docstore du DCE, adossé au DocStore persistant (chargement paresseux).
+
+    Seuls les fichiers dont l'empreinte est inconnue pour extractor_version() sont extraits ;
+    les doublons (même contenu sous deux noms) ne le sont qu'une fois.
+    """
+    path = os.path.join(upload_dir, job_id)
+    files = list_files(path)
+    store = store or DocStore.from_env(upload_dir)
+    digests = {f: file_digest(os.path.join(path, f)) for f in files if f.endswith(EXTRACTABLE)}
+    version = extractor_version()
+
+    known = store.known(digests.values(), version)
+    todo = {}
+    for file, digest in digests.items():
+        if digest not in known:
+            todo.setdefault(digest, file)
+
+    pages, tables = {}, {}
+    for file, page, content in iter_extract(job_id, upload_dir, workers, files=list(todo.values())):
+        if page is None:
+            tables[file] = content
+        else:
+            pages.setdefault(file, []).append((page, content))
+    for digest, file in todo.items():
+        store.put(digest, version, sorted(pages.get(file, [])), tables.get(file) if file.endswith(".xlsx") else None)
+
+    return DocstoreView(store, version, files, digests)
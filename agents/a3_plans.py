@@ -1,5 +1,6 @@
+from agents.rules import apply_rules
+
 def analyze(docstore: dict) -> dict:
-    text = docstore["doc_text"]
     results = {
         "Facades": "Non detecte",
         "Acces": "Non detecte",
@@ -7,9 +8,4 @@ def analyze(docstore: dict) -> dict:
         "Environnement": "Non detecte",
         "Quantitatif": "Non detecte"
     }
-
-    if "nacelle" in text.lower(): results["Acces"] = "Nacelle necessaire"
-    if "echafaudage" in text.lower(): results["Acces"] = "Echafaudage necessaire"
-    if "site occupe" in text.lower(): results["Phasage"] = "Site occupe"
-
-    return results
+    return apply_rules("plans", docstore, results)
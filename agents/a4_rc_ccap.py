@@ -1,5 +1,6 @@
+from agents.rules import apply_rules
+
 def analyze(docstore: dict) -> dict:
-    text = docstore["doc_text"]
     results = {
         "Variantes": "Non detecte",
         "Criteres": "Non detecte",
@@ -10,8 +11,4 @@ def analyze(docstore: dict) -> dict:
         "SAV": "Non detecte",
         "Pieges": []
     }
-
-    if "variante" in text.lower(): results["Variantes"] = "Mentionne"
-    if "penalite" in text.lower(): results["Penalites"] = "Penalites prevues"
-
-    return results
+    return apply_rules("rc_ccap", docstore, results)
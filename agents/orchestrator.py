@@ -0,0 +1,277 @@
+import asyncio, multiprocessing, os, shutil, time, uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from agents import a1_extract, a2_cctp, a3_plans, a4_rc_ccap, a5_dpgf, a6_livrables, a7_amiante
+from utils.metrics import JOB_STAGE_SECONDS
+from utils.text_index import text_index
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
+
+# étape d'analyse -> clé du résultat agrégé
+ANALYSES = {
+    "cctp": ("CCTP", a2_cctp.analyze),
+    "plans": ("Plans", a3_plans.analyze),
+    "rc_ccap": ("RC_CCAP", a4_rc_ccap.analyze),
+    "dpgf": ("DPGF", a5_dpgf.analyze),
+    "amiante": ("Amiante", a7_amiante.analyze),
+}
+
+
+# docstores des jobs dont les processus d'analyse démarrent : hérités au fork, jamais sérialisés
+_FORKED_DOCSTORES: Dict[str, object] = {}
+
+
+def _run_forked_analysis(job_id, name):
+    return ANALYSES[name][1](_FORKED_DOCSTORES[job_id])
+
+
+class _ForkedAnalyses:
+    """Analyses d'un job dans des processus forkés une fois l'extraction finie.
+
+    Les agents CPU tournent réellement en parallèle (un GIL par processus) et héritent du
+    docstore et de son index par copie à l'écriture, au lieu de les recevoir sérialisés.
+    """
+
+    def __init__(self, job_id, workers):
+        self.job_id = job_id
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self, docstore):
+        docstore["tables"]  # matérialisés avant le fork : les enfants ne touchent pas à SQLite
+        _FORKED_DOCSTORES[self.job_id] = docstore
+        try:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("fork"))
+            # avec fork, le premier submit lance tous les processus : ils ont le docstore
+            self._executor.submit(int)
+        finally:
+            del _FORKED_DOCSTORES[self.job_id]
+
+    def run(self, name):
+        return self._executor.submit(_run_forked_analysis, self.job_id, name).result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _analysis_mode(mode):
+    """auto : processus si fork est disponible et qu'il y a plusieurs cœurs, threads sinon."""
+    if mode == "auto":
+        return "process" if "fork" in multiprocessing.get_all_start_methods() and (os.cpu_count() or 1) > 1 else "thread"
+    return mode
+
+
+class JobsSaturated(Exception):
+    """Trop de jobs en attente : l'appelant doit renvoyer un 503 avec Retry-After."""
+
+
+class Job:
+    def __init__(self, job_id, url=None, sha256=None):
+        self.id = job_id
+        self.url = url
+        self.sha256 = sha256
+        self.status = "pending"
+        self.created = time.time()
+        self.stages: Dict[str, dict] = {}
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created": self.created,
+            "stages": self.stages,
+            "error": self.error,
+        }
+
+
+def _pipeline(job, upload_dir, extract_workers, analyses: Optional[_ForkedAnalyses] = None) -> "OrderedDict[str, Tuple[Tuple[str, ...], Callable]]":
+    """DAG du job : [download ->] extract -> analyses en parallèle -> livrables (ordre topologique).
+
+    Les analyses attendent le docstore complet plutôt que le flux d'iter_extract : chaque agent
+    conclut sur l'ensemble du DCE (« Non detecte » n'est sûr qu'une fois toutes les pages lues,
+    la première occurrence d'une règle suit l'ordre des fichiers, pas celui d'achèvement des
+    tranches), et ne coûte que quelques ms sur l'index partagé. Le gain est dans l'extraction,
+    parallèle par tranches de pages. Avec `analyses`, chaque agent tourne dans un processus forké.
+    """
+    stages = OrderedDict()
+
+    def extract(ctx):
+        docstore = a1_extract.build_docstore(job.id, upload_dir, workers=extract_workers)
+        text_index(docstore)  # construit une fois, avant que les analyses ne le partagent
+        if analyses is not None:
+            analyses.start(docstore)
+        return docstore
+
+    if job.url:
+        stages["download"] = ((), lambda ctx: a1_extract.download_and_extract(job.url, upload_dir, job_id=job.id, sha256=job.sha256))
+        stages["extract"] = (("download",), extract)
+    else:
+        stages["extract"] = ((), extract)
+    for name, (_, analyze) in ANALYSES.items():
+        if analyses is None:
+            stages[name] = (("extract",), lambda ctx, analyze=analyze: analyze(ctx["extract"]))
+        else:
+            stages[name] = (("extract",), lambda ctx, name=name: analyses.run(name))
+
+    def livrables(ctx):
+        resultats = {key: ctx[name] for name, (key, _) in ANALYSES.items()}
+        return {"resultats": resultats, "livrables": a6_livrables.generate(resultats, job.id, upload_dir)}
+
+    stages["livrables"] = (tuple(ANALYSES), livrables)
+    return stages
+
+
+class JobManager:
+    """Jobs d'analyse DCE exécutés en tâche de fond, consultables par id.
+
+    `concurrency` jobs tournent à la fois, `max_pending` attendent (au-delà : JobsSaturated).
+    Les étapes indépendantes d'un job s'exécutent en parallèle sur un pool de threads ;
+    l'extraction PDF répartit elle-même ses pages sur les cœurs (a1_extract), et avec
+    `analysis_mode` "process" les agents tournent dans des processus forkés par job
+    (_ForkedAnalyses). Seuls les `max_jobs` derniers jobs terminés sont conservés, fichiers compris.
+    """
+
+    def __init__(self, upload_dir=UPLOAD_DIR, concurrency=1, max_pending=16, max_jobs=100, extract_workers=None,
+                 analysis_mode="auto"):
+        self.upload_dir = upload_dir
+        self.concurrency = max(1, concurrency)
+        self.max_pending = max_pending
+        self.max_jobs = max_jobs
+        self.extract_workers = extract_workers
+        self.analysis_mode = _analysis_mode(analysis_mode)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_env(cls):
+        workers = int(os.environ.get("EXTRACT_WORKERS", "0"))
+        return cls(
+            upload_dir=UPLOAD_DIR,
+            concurrency=int(os.environ.get("JOBS_CONCURRENCY", "1")),
+            max_pending=int(os.environ.get("JOBS_MAX_PENDING", "16")),
+            max_jobs=int(os.environ.get("JOBS_MAX", "100")),
+            extract_workers=workers or None,
+            analysis_mode=os.environ.get("JOBS_ANALYSIS_MODE", "auto"),
+        )
+
+    def new_job_dir(self):
+        """(id, répertoire) d'un nouveau job, à remplir avant `submit`."""
+        job_id = str(uuid.uuid4())
+        path = os.path.join(self.upload_dir, job_id)
+        os.makedirs(path, exist_ok=True)
+        return job_id, path
+
+    def get(self, job_id) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    @property
+    def active(self) -> int:
+        return sum(1 for j in self._jobs.values() if not j.finished)
+
+    def check_capacity(self) -> None:
+        """JobsSaturated si un nouveau job serait refusé (à vérifier avant d'écrire l'upload sur disque)."""
+        if sum(1 for j in self._jobs.values() if j.status == "pending") >= self.max_pending:
+            raise JobsSaturated()
+
+    def discard(self, job_id) -> None:
+        """Supprime les fichiers d'un job : répertoire extrait (résultats compris), ZIP téléchargé
+        et téléchargement inachevé."""
+        shutil.rmtree(os.path.join(self.upload_dir, job_id), ignore_errors=True)
+        for name in (f"{job_id}.zip", *a1_extract.download_files(job_id)):
+            try:
+                os.remove(os.path.join(self.upload_dir, name))
+            except OSError:
+                pass
+
+    def submit(self, job_id=None, url=None, sha256=None) -> Job:
+        self.check_capacity()
+        job = Job(job_id or str(uuid.uuid4()), url=url, sha256=sha256)
+        self._jobs[job.id] = job
+        self._trim()
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        return job
+
+    def _trim(self):
+        done = [j.id for j in self._jobs.values() if j.finished]
+        for job_id in done[: max(0, len(done) - self.max_jobs)]:
+            del self._jobs[job_id]
+            self.discard(job_id)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="marchia-job")
+        return self._executor
+
+    async def _run(self, job):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            job.status = "running"
+            analyses = _ForkedAnalyses(job.id, min(len(ANALYSES), os.cpu_count() or 1)) if self.analysis_mode == "process" else None
+            try:
+                ctx = await self._run_dag(job, _pipeline(job, self.upload_dir, self.extract_workers, analyses))
+                job.result = ctx["livrables"]
+                job.status = "done"
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = "error"
+            finally:
+                if analyses is not None:
+                    analyses.close()
+        self._trim()
+
+    async def _run_dag(self, job, stages):
+        loop = asyncio.get_running_loop()
+        ctx: Dict[str, object] = {}
+        tasks: Dict[str, asyncio.Future] = {}
+        for name in stages:
+            job.stages[name] = {"status": "pending", "duration_s": None}
+
+        async def run_stage(name):
+            deps, fn = stages[name]
+            try:
+                await asyncio.gather(*(tasks[d] for d in deps))
+            except Exception:
+                job.stages[name]["status"] = "skipped"
+                raise
+            info = job.stages[name]
+            info["status"] = "running"
+            t0 = time.perf_counter()
+            try:
+                ctx[name] = await loop.run_in_executor(self._get_executor(), fn, ctx)
+            except Exception:
+                info["status"] = "error"
+                raise
+            finally:
+                elapsed = time.perf_counter() - t0
+                info["duration_s"] = round(elapsed, 3)
+                JOB_STAGE_SECONDS.observe(elapsed, name, "error" if info["status"] == "error" else "done")
+            info["status"] = "done"
+
+        for name in stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+        outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        errors = [o for name, o in zip(stages, outcomes) if isinstance(o, Exception) and job.stages[name]["status"] == "error"]
+        if errors:
+            raise errors[0]
+        return ctx
+
+    def shutdown(self):
+        for job in self._jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
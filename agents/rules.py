@@ -0,0 +1,106 @@
+import copy, json, os, re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils.text_index import fold, text_index
+
+RULES_PATH = os.environ.get("RULES_PATH", os.path.join(os.path.dirname(__file__), "rules.json"))
+# format documenté dans rules.schema.json
+_NOT_LITERAL_RE = re.compile(r"\\.|\(\?P<\w+>|\(\?P=\w+\)")  # échappements (\S, \D...), noms de groupes
+
+
+class Rule(NamedTuple):
+    id: str
+    terms: Tuple[str, ...]
+    prefix: bool
+    pattern: Optional["re.Pattern"]
+    set: Dict[str, object]
+    append: Dict[str, object]
+
+
+def _compile_rule(i, raw):
+    terms = tuple(raw.get("terms") or ())
+    pattern = raw.get("pattern")
+    if not terms and not pattern:
+        raise ValueError(f"règle {raw.get('id', i)} : 'terms' ou 'pattern' requis")
+    # la regex s'applique au texte replié : une majuscule ou un accent n'y trouverait rien
+    literal = _NOT_LITERAL_RE.sub("", pattern or "")
+    if fold(literal) != literal:
+        raise ValueError(f"règle {raw.get('id', i)} : 'pattern' doit être écrit en minuscules sans accents ({pattern!r})")
+    return Rule(
+        id=raw.get("id", str(i)),
+        terms=terms,
+        prefix=bool(raw.get("prefix", False)),
+        pattern=re.compile(pattern) if pattern else None,
+        set=raw.get("set") or {},
+        append=raw.get("append") or {},
+    )
+
+
+def load_rules(path=RULES_PATH):
+    """{agent: [Rule]} depuis un fichier JSON (ou YAML si PyYAML est installé) ; les clés "$..." ($schema) sont ignorées."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            raw = yaml.safe_load(f)
+        else:
+            raw = json.load(f)
+    return {agent: [_compile_rule(i, r) for i, r in enumerate(rules)] for agent, rules in raw.items() if not agent.startswith("$")}
+
+
+@lru_cache(maxsize=1)
+def default_rules():
+    return load_rules()
+
+
+def _fill(value, match):
+    if isinstance(value, str) and match is not None:
+        return value.format(match.group(0), **match.groupdict())
+    return copy.deepcopy(value)
+
+
+def _slot(results, dotted):
+    """(dict parent, clé) désignés par un chemin pointé ("Performances.Uw")."""
+    *parents, leaf = dotted.split(".")
+    target = results
+    for key in parents:
+        target = target.setdefault(key, {})
+    return target, leaf
+
+
+def apply_rules(agent, docstore, results, rules=None):
+    """Applique les règles de `agent` au docstore et complète `results` (dans l'ordre du fichier).
+
+    Les mots-clés sont résolus sur l'index inversé partagé (coût indépendant de la taille
+    du texte) ; une regex n'est évaluée que sur les pages où un de ses mots-clés apparaît,
+    ou sur tout le texte si la règle n'en déclare aucun. Mots-clés et regex sont comparés
+    au texte replié (casse et accents ignorés) ; les captures reprises dans `set`/`append`
+    sont celles du texte d'origine.
+    """
+    index = text_index(docstore)
+    rules = (rules or default_rules()).get(agent, [])
+    hits_cache: Dict[Tuple[str, bool], List] = {}
+
+    def hits(term, prefix):
+        key = (term, prefix)
+        if key not in hits_cache:
+            hits_cache[key] = index.find(term, prefix=prefix)
+        return hits_cache[key]
+
+    for rule in rules:
+        if rule.terms and not any(hits(t, rule.prefix) for t in rule.terms):
+            continue
+        match = None
+        if rule.pattern is not None:
+            found = [h for t in rule.terms for h in hits(t, rule.prefix)] if rule.terms else None
+            matches = index.matches(rule.pattern, within=found)
+            if not matches:
+                continue
+            match = matches[0][1]
+        for dotted, value in rule.set.items():
+            target, leaf = _slot(results, dotted)
+            target[leaf] = _fill(value, match)
+        for dotted, value in rule.append.items():
+            target, leaf = _slot(results, dotted)
+            target.setdefault(leaf, []).append(_fill(value, match))
+    return results
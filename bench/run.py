@@ -0,0 +1,284 @@
+"""Benchmarks des étapes du service, comparés à bench/baseline.json.
+
+    python -m bench.run            # profil complet, échoue si une étape régresse
+    python -m bench.run --quick    # sous-ensemble rapide (CI)
+    python -m bench.run --update   # réécrit la baseline des étapes mesurées
+
+Les temps sont exprimés en unités d'une boucle de calibration exécutée juste avant
+chaque mesure, pour rester comparables d'un poste à l'autre. Les étapes sont mesurées
+en tours entrelacés (une exécution de chaque étape par tour) et la médiane est retenue :
+un ralentissement passager de la machine ne touche qu'un tour, pas toute une étape.
+La mémoire est le pic tracemalloc d'une exécution séparée (les allocations Python, pas le RSS).
+Une étape en régression est remesurée seule avant de faire échouer le banc : seul un
+écart qui se reproduit compte.
+"""
+import argparse
+import atexit
+import gc
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from bench import synth
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+TIME_TOLERANCE = float(os.environ.get("BENCH_TIME_TOLERANCE", "0.30"))
+MEM_TOLERANCE = float(os.environ.get("BENCH_MEM_TOLERANCE", "0.20"))
+# en deçà, l'écart est du bruit de mesure
+MIN_TIME_DELTA_S = 0.005
+MIN_MEM_DELTA_MB = 1.0
+# au-delà, SLOW_STAGE_ROUNDS tours suffisent : une étape de plusieurs secondes est peu bruitée
+SLOW_STAGE_S = 2.0
+SLOW_STAGE_ROUNDS = 3
+# chargés à la première utilisation (ou au warm-up), jamais par l'import de main
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pdfplumber", "pdfminer", "docx", "lxml", "requests", "fitz", "PIL")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _calibrate(rounds: int = 25) -> float:
+    """Durée (s) d'une charge Python fixe : l'unité de temps de la machine courante.
+
+    Charge courte répétée, minimum retenu : le minimum est peu sensible aux voisins bruyants.
+    """
+    def work():
+        d = {}
+        for i in range(40_000):
+            d[str(i)] = i * 2
+        return sorted(d.values(), reverse=True)[:10]
+    return min(_timed(work) for _ in range(rounds))
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    gc.collect()
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _peak_mb(fn: Callable[[], object]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def _stages(quick: bool) -> List[Tuple[str, Callable[[], Callable[[], object]]]]:
+    """(nom, préparation) ; la préparation génère les données et renvoie la fonction mesurée."""
+    import main
+    from agents import a1_extract
+    from utils.docstore import DocStore
+
+    stages = []
+
+    def prep_import():
+        # import à froid dans un interpréteur neuf : ce que paie chaque worker au démarrage
+        probe = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        heavy = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        assert not heavy, f"importés par main : {heavy}"
+        return lambda: subprocess.run([sys.executable, "-c", "import main"], cwd=ROOT, check=True)
+    stages.append(("import_main", prep_import))
+
+    csv_sizes = (1_000, 10_000) if quick else (10, 1_000, 10_000, 50_000)
+    for n in csv_sizes:
+        for delim, enc in ((";", "utf-8-sig"), (",", "latin-1")):
+            def prep(n=n, delim=delim, enc=enc):
+                raw = synth.quant_csv(n, delim, enc)
+                return lambda: main._read_csv_quant(main._decode_text(raw))
+            stages.append((f"read_csv_quant/{n}/{'semicolon' if delim == ';' else 'comma'}/{enc}", prep))
+    for n in ((10_000,) if quick else (1_000, 50_000)):
+        for delim, enc in ((";", "utf-8-sig"), (",", "latin-1")):
+            def prep(n=n, delim=delim, enc=enc):
+                import io, zipfile
+                buf = io.BytesIO()
+                with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+                    zf.writestr("DPGF.csv", synth.quant_csv(n, delim, enc))
+                blob = buf.getvalue()
+
+                def run():
+                    # flux : aucune ligne conservée, le pic mémoire doit rester plat
+                    zf = zipfile.ZipFile(io.BytesIO(blob))
+                    return sum(1 for _ in main._iter_quant_member(zf, "DPGF.csv"))
+                return run
+            stages.append((f"iter_quant_member/{n}/{'semicolon' if delim == ';' else 'comma'}/{enc}", prep))
+    for n in ((1_000,) if quick else (10, 1_000, 10_000, 50_000)):
+        def prep(n=n):
+            data = synth.quant_xlsx(n)
+            return lambda: main._try_read_xlsx_quant(data)
+        stages.append((f"try_read_xlsx_quant/{n}", prep))
+
+    def prep_stale():
+        # <dimension> périmée (A1:G10) : toutes les lignes doivent quand même être lues
+        data = synth.quant_xlsx(1_000, dimension="A1:G10")
+        n = len(main._try_read_xlsx_quant(data))
+        assert n == 1_000, f"{n} lignes lues sur 1000"
+        return lambda: main._try_read_xlsx_quant(data)
+    stages.append(("try_read_xlsx_quant/1000/stale_dimension", prep_stale))
+
+    def prep_numeric():
+        # colonnes numériques trouées : mode colonnaire et ligne à ligne doivent rendre les mêmes lignes
+        data = synth.quant_xlsx(1_000, numeric=True)
+        columnar, rows = main._read_xlsx_quant_df(data), list(main._iter_xlsx_quant(data))
+        assert columnar == rows, next(f"{a} != {b}" for a, b in zip(columnar + [None] * len(rows), rows) if a != b)
+        return lambda: main._read_xlsx_quant_df(data)
+    stages.append(("read_xlsx_quant_df/1000/numeric", prep_numeric))
+
+    def prep_find():
+        names = [f"DCE/Lot{i % 12:02d}/piece_{i:05d}.{('pdf', 'docx', 'dwg', 'xlsx', 'csv')[i % 5]}" for i in range(5_000)]
+        names.append("DCE/Lot05/DPGF_Lot05_menuiseries.xlsx")
+        return lambda: [main._find_quant_file(names) for _ in range(20)]
+    stages.append(("find_quant_file/5000x20", prep_find))
+
+    for n in ((30, 1_000) if quick else (30, 1_000, 5_000)):
+        def prep(n=n):
+            lignes = main._read_csv_quant(main._decode_text(synth.quant_csv(n)))
+            req = main.FicheRequest(projet="Résidence Bench", moa="OPH", lot="Lot 05", descriptif="CCTP\nmenuiseries")
+            main.build_doc(req, lignes)  # template chargé hors mesure
+            return lambda: main.build_doc(req, lignes)
+        stages.append((f"build_doc/{n}", prep))
+
+    for n in ((10_000,) if quick else (1_000, 50_000)):
+        def prep(n=n):
+            lignes = main._read_csv_quant(main._decode_text(synth.quant_csv(n)))
+            req = main.FicheRequest(projet="Résidence Bench", moa="OPH", lot="Lot 05", descriptif="", lignes=[L._asdict() for L in lignes])
+            return lambda: b"".join(main._fiche_json_chunks(req))
+        stages.append((f"fiche_json/{n}", prep))
+
+    for pages in ((30,) if quick else (60, 300)):
+        def prep(pages=pages):
+            root = tempfile.mkdtemp(prefix="bench-dce-")
+            atexit.register(shutil.rmtree, root, True)
+            job = os.path.join(root, "job")
+            os.makedirs(job)
+            with open(os.path.join(job, "cctp.pdf"), "wb") as f:
+                f.write(synth.text_pdf(pages))
+            with open(os.path.join(job, "ccap.docx"), "wb") as f:
+                f.write(synth.text_docx(200))
+            with open(os.path.join(job, "dpgf.xlsx"), "wb") as f:
+                f.write(synth.quant_xlsx(500))
+            runs = iter(range(1_000_000))
+
+            def run():
+                # docstore neuf à chaque mesure : extraction à froid
+                store = DocStore(os.path.join(root, f"store-{next(runs)}.sqlite"))
+                d = a1_extract.build_docstore("job", root, workers=1, store=store)
+                return d["doc_text"], d["tables"]
+            return run
+        stages.append((f"build_docstore/{pages}p", prep))
+
+    for lines, fmt in (((2_000, "csv"),) if quick else ((2_000, "csv"), (20_000, "csv"), (20_000, "xlsx"))):
+        def prep(lines=lines, fmt=fmt):
+            from fastapi.testclient import TestClient
+            from utils.result_cache import ResultCache
+            main.RESULT_CACHE = ResultCache(max_bytes=0)  # chaque mesure régénère la fiche
+            client = TestClient(main.app)
+            data = synth.dce_zip(lines, fmt, pdf_pages=20)
+
+            def run():
+                r = client.post("/genere-fiche-dce", files={"file": ("dce.zip", data, "application/zip")})
+                assert r.status_code == 200, r.text
+                return r.content
+            return run
+        stages.append((f"genere_fiche_dce/{lines}/{fmt}", prep))
+    return stages
+
+
+def measure(quick: bool, repeat: int, only: str = "", names: Optional[Set[str]] = None) -> Tuple[Dict[str, dict], float]:
+    """Mesures par étape, en `repeat` tours entrelacés.
+
+    Chaque mesure est précédée d'une courte calibration ; le temps retenu est la médiane
+    des rapports temps / unité locale. Renvoie aussi l'unité médiane (pour les seuils en secondes).
+    """
+    stages = []
+    for name, prep in _stages(quick):
+        if (only and only not in name) or (names is not None and name not in names):
+            continue
+        fn = prep()
+        warm = _timed(fn)
+        stages.append((name, fn, SLOW_STAGE_ROUNDS if warm > SLOW_STAGE_S else repeat))
+    samples: Dict[str, List[Tuple[float, float]]] = {name: [] for name, _, _ in stages}
+    for i in range(max([repeat] + [n for _, _, n in stages])):
+        for name, fn, rounds in stages:
+            if i < rounds:
+                unit = _calibrate(5)
+                samples[name].append((_timed(fn), unit))
+    results = {}
+    for name, fn, _ in stages:
+        times = samples[name]
+        t = statistics.median(t for t, _ in times)
+        results[name] = {
+            "time_s": round(t, 4),
+            "peak_mb": round(_peak_mb(fn), 2),
+            "time_units": round(statistics.median(t / u for t, u in times), 4),
+        }
+        print(f"{name:55s} {t * 1000:9.1f} ms {results[name]['peak_mb']:8.1f} Mo", flush=True)
+    unit = statistics.median(u for times in samples.values() for _, u in times) if samples else _calibrate()
+    print(f"(unité de calibration : {unit * 1000:.2f} ms)")
+    return results, unit
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], unit_s: float) -> List[Tuple[str, str]]:
+    """(étape, écart) des étapes au-delà des tolérances."""
+    failures = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        t_new, t_old = r["time_units"], base["time_units"]
+        if t_new > t_old * (1 + TIME_TOLERANCE) and (t_new - t_old) * unit_s > MIN_TIME_DELTA_S:
+            failures.append((name, f"{name}: temps {t_old:.2f} u -> {t_new:.2f} u (+{(t_new / max(t_old, 1e-9) - 1) * 100:.0f} %)"))
+        m_new, m_old = r["peak_mb"], base["peak_mb"]
+        if m_new > m_old * (1 + MEM_TOLERANCE) and m_new - m_old > MIN_MEM_DELTA_MB:
+            failures.append((name, f"{name}: mémoire {m_old:.1f} Mo -> {m_new:.1f} Mo (+{(m_new / max(m_old, 1e-9) - 1) * 100:.0f} %)"))
+    return failures
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true", help="sous-ensemble rapide")
+    ap.add_argument("--repeat", type=int, default=5, help="tours de mesure (médiane retenue)")
+    ap.add_argument("--only", default="", help="ne mesurer que les étapes contenant ce texte")
+    ap.add_argument("--update", action="store_true", help="enregistrer les mesures comme baseline")
+    args = ap.parse_args(argv)
+
+    results, unit_s = measure(args.quick, args.repeat, args.only)
+    try:
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    if args.update:
+        baseline.update(results)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baseline.items())), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"baseline mise à jour : {len(results)} étapes")
+        return 0
+    failures = compare(results, baseline, unit_s)
+    missing = [n for n in results if n not in baseline]
+    if missing:
+        print(f"sans baseline ({len(missing)}) : {', '.join(missing)}")
+    if failures:
+        # un ralentissement passager de la machine peut toucher plusieurs tours : on remesure seules les étapes suspectes
+        suspects = {name for name, _ in failures}
+        print(f"à confirmer ({len(suspects)}) : {', '.join(sorted(suspects))}")
+        confirmed, unit_s = measure(args.quick, args.repeat, names=suspects)
+        failures = compare(confirmed, baseline, unit_s)
+    if failures:
+        print("RÉGRESSIONS :\n  " + "\n  ".join(msg for _, msg in failures))
+        return 1
+    print("aucune régression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
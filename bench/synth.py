@@ -0,0 +1,110 @@
+"""Générateur de DCE synthétiques pour les benchmarks (déterministe à graine fixe)."""
+import csv
+import io
+import json
+import random
+import re
+import zipfile
+from typing import List, Tuple
+
+import docx
+from openpyxl import Workbook
+
+from utils.quant_export import pdf_chunks
+
+HEADERS = ["Repère", "Désignation", "Dimensions", "Performances", "Quantité", "Pose", "Observations"]
+_TYPES = ["Fenêtre PVC", "Porte-fenêtre alu", "Châssis fixe", "Volet roulant", "Bloc-porte EI 30", "Baie coulissante"]
+_PERFS = ["Uw = 1,3 W/m².K", "Rw+Ctr 32 dB", "EI 30", "A2P BP1", ""]
+_POSES = ["Neuf", "Rénovation", "Dépose totale", ""]
+
+
+def quant_rows(n: int, seed: int = 0) -> List[Tuple]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        w, h = rnd.choice((600, 800, 1000, 1200, 1450)), rnd.choice((900, 1350, 2150))
+        typo = f"{rnd.choice(_TYPES)} {rnd.choice(('1 vantail', '2 vantaux', 'oscillo-battant'))}"
+        rows.append((f"F{i + 1:05d}", typo, f"{w}x{h}", rnd.choice(_PERFS), rnd.randint(1, 40), rnd.choice(_POSES), "" if i % 7 else "à vérifier"))
+    return rows
+
+
+def quant_csv(n: int, delimiter: str = ";", encoding: str = "utf-8-sig", seed: int = 0) -> bytes:
+    buf = io.StringIO()
+    w = csv.writer(buf, delimiter=delimiter, lineterminator="\r\n")
+    w.writerow(HEADERS)
+    for row in quant_rows(n, seed):
+        w.writerow(row)
+    return buf.getvalue().encode(encoding, "replace")
+
+
+def quant_xlsx(n: int, seed: int = 0, header_row: int = 3, dimension: str = "", numeric: bool = False) -> bytes:
+    """`dimension` : balise <dimension> forcée (ex. "A1:G10"), comme l'écrivent certains exportateurs.
+    `numeric` : repères et largeurs en nombres, avec des cellules vides (colonnes numériques trouées).
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("DPGF")
+    for _ in range(header_row - 1):
+        ws.append(["Lot 05 - Menuiseries extérieures"])
+    ws.append(HEADERS)
+    for i, row in enumerate(quant_rows(n, seed)):
+        row = list(row)
+        if numeric:
+            row[0] = None if i % 5 == 4 else 100 + i
+            row[2] = None if i % 7 == 6 else int(row[2].split("x")[0])
+            row[4] = row[4] if i % 9 else None
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return _with_dimension(buf.getvalue(), dimension) if dimension else buf.getvalue()
+
+
+def _with_dimension(data: bytes, ref: str) -> bytes:
+    out = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(data)) as src, zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            body = src.read(info)
+            if info.filename.startswith("xl/worksheets/sheet"):
+                # le mode write-only n'écrit pas de <dimension> : elle précède <sheetViews>
+                tag = b'<dimension ref="' + ref.encode() + b'"/>'
+                body = re.sub(rb"<dimension [^>]*/>", b"", body, count=1).replace(b"<sheetViews>", tag + b"<sheetViews>", 1)
+            dst.writestr(info, body)
+    return out.getvalue()
+
+
+_LOREM = ("Les menuiseries extérieures seront en PVC, conformes au DTU 36.5, Uw 1,3. "
+          "L'entreprise prévoit nacelle ou échafaudage, site occupé, pénalités de retard. "
+          "Présence d'amiante dans les joints de vitrage : mode opératoire sous-section 4. ")
+
+
+def text_pdf(pages: int, title: str = "CCTP", seed: int = 0) -> bytes:
+    """PDF texte de `pages` pages (réutilise l'export PDF du service, sans dépendance)."""
+    rnd = random.Random(seed)
+    per_page = 37
+    rows = ((f"{i}", _LOREM[rnd.randrange(60):][:90], "", "") for i in range(pages * per_page))
+    return b"".join(pdf_chunks(title, ["§", "Texte", "", ""], [4, 80, 8, 8], rows))
+
+
+def text_docx(paragraphs: int) -> bytes:
+    d = docx.Document()
+    for i in range(paragraphs):
+        d.add_paragraph(f"Article {i}. {_LOREM}")
+    buf = io.BytesIO()
+    d.save(buf)
+    return buf.getvalue()
+
+
+def dce_zip(lines: int, fmt: str = "csv", pdf_pages: int = 50, seed: int = 0, **csv_kw) -> bytes:
+    """ZIP DCE : RC + CCTP (PDF), CCAP (DOCX), DPGF (CSV ou XLSX), meta.json, plus quelques pièces annexes."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("01_RC.pdf", text_pdf(max(1, pdf_pages // 10), "RC", seed))
+        zf.writestr("02_CCTP_Lot05.pdf", text_pdf(pdf_pages, "CCTP", seed))
+        zf.writestr("03_CCAP.docx", text_docx(40))
+        if fmt == "xlsx":
+            zf.writestr("04_DPGF_Lot05.xlsx", quant_xlsx(lines, seed))
+        else:
+            zf.writestr("04_DPGF_Lot05.csv", quant_csv(lines, seed=seed, **csv_kw))
+        zf.writestr("meta.json", json.dumps({"projet": "Résidence Bench", "moa": "OPH", "lot": "Lot 05"}))
+        for i in range(20):
+            zf.writestr(f"Plans/PLAN_{i:03d}.txt", "plan")
+    return buf.getvalue()
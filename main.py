@@ -1,19 +1,116 @@
-﻿from fastapi import FastAPI, Response, Query, UploadFile, File, Form, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional, Tuple, Dict
-from io import BytesIO
-import zipfile, csv, json, re, os
-
-from docx import Document
-from docx.text.paragraph import Paragraph
-from docx.table import Table
-from docx.enum.text import WD_BREAK
-from docx.shared import Pt
+﻿from __future__ import annotations
+import time
+_IMPORT_T0 = time.perf_counter()
+
+from fastapi import FastAPI, Response, Query, UploadFile, File, Form, HTTPException, Header
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, TypeAdapter
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Tuple, Dict, Iterable, Iterator, AsyncIterator, Awaitable, Callable, Union
+from io import BytesIO, StringIO
+from urllib.parse import quote
+import zipfile, csv, json, re, os, io, copy, codecs, itertools, threading, asyncio, hashlib, functools, importlib, logging, shutil, tempfile
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+# python-docx (et utils.docx_template / utils.docx_stream), openpyxl, pandas et pdfplumber
+# sont importés à la première utilisation ; _warm_up les charge dès le démarrage.
+if TYPE_CHECKING:
+    from docx import Document
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+    from utils.docx_stream import DocxSkeleton
+from utils.quant_export import CSV_MEDIA_TYPE, PDF_MEDIA_TYPE, XLSX_MEDIA_TYPE, csv_chunks, pdf_chunks, xlsx_bytes
+from utils.body_limit import BodyLimitMiddleware
+from utils.fast_json import JSON_MEDIA_TYPE, FastJSONResponse, dumps as json_dumps
+from utils.result_cache import CachedResult, ResultCache
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, STARTUP_SECONDS, Counter, Gauge, MetricsMiddleware, count_rows, stage, timed_iter
+from utils.profiler import SamplingProfiler
+from utils.worker_pool import BoundedPool, PoolSaturated
+from utils.extract_zip import MemberTooLarge, extract_selected
+from utils.download import UrlNotAllowed, check_url
+from agents.a1_extract import EXTRACTABLE
+from agents.orchestrator import JobManager, JobsSaturated
 
 __VERSION__ = "2025-08-27-17"
 TEMPLATE_PATH = "templates/fiche_demo_MARCHIA_full.docx"
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "500")) * 1024 * 1024
+MAX_MEMBER_BYTES = int(os.environ.get("MAX_MEMBER_MB", "200")) * 1024 * 1024
+RETRY_AFTER_S = int(os.environ.get("WORKER_RETRY_AFTER_S", "5"))
+QUANT_PARSER = os.environ.get("QUANT_PARSER", "auto")
+BATCH_MAX_FICHES = int(os.environ.get("BATCH_MAX_FICHES", "100"))
+QUANT_COLUMNAR_MIN_BYTES = int(os.environ.get("QUANT_COLUMNAR_MIN_KB", "256")) * 1024
+STARTUP_WARMUP = os.environ.get("STARTUP_WARMUP", "background")  # background | blocking | off
+JSON_STREAM_MIN_ROWS = int(os.environ.get("JSON_STREAM_MIN_ROWS", "5000"))
+JSON_BATCH_ROWS = 1000
+
+# ---------- Démarrage ----------
+log = logging.getLogger("uvicorn.error")
+
+def _warm_up(done: Optional[threading.Event] = None) -> None:
+    """Imports lourds, template parsé, règles compilées : la première vraie requête n'en paie aucun.
+
+    Chaque étape est chronométrée (marchia_startup_seconds) ; un échec est ignoré,
+    la requête qui en a besoin le rencontrera à son tour.
+    """
+    steps = [
+        ("template", lambda: TEMPLATE_CACHE.load()),  # importe aussi python-docx
+        ("openpyxl", lambda: importlib.import_module("openpyxl")),
+        ("pandas", lambda: QUANT_PARSER != "python" and importlib.import_module("pandas")),
+        ("pdfplumber", lambda: importlib.import_module("pdfplumber")),
+        ("rules", lambda: importlib.import_module("agents.rules").default_rules()),
+    ]
+    t_all = time.perf_counter()
+    try:
+        for name, step in steps:
+            t0 = time.perf_counter()
+            try:
+                step()
+            except Exception as e:
+                log.warning("warm-up %s : %s: %s", name, type(e).__name__, e)
+            STARTUP_SECONDS.set(time.perf_counter() - t0, f"warmup_{name}")
+    finally:
+        if done is not None:
+            done.set()
+    STARTUP_SECONDS.set(time.perf_counter() - t_all, "warmup")
+    log.info("warm-up terminé en %.2f s", time.perf_counter() - t_all)
+
+# warm-up en cours (None sinon) : un fork (pools de processus) pendant un import hériterait du
+# verrou du module et bloquerait l'enfant ; il attend donc la fin du warm-up
+_warmup_done: Optional[threading.Event] = None
 
-app = FastAPI()
+def _wait_for_warm_up() -> None:
+    done = _warmup_done
+    if done is not None:
+        done.wait()
+
+# une seule fois par processus, même si main est rechargé ou l'app relancée (tests)
+if hasattr(os, "register_at_fork") and not globals().get("_FORK_HOOK_REGISTERED"):
+    os.register_at_fork(before=_wait_for_warm_up)
+    _FORK_HOOK_REGISTERED = True
+
+@asynccontextmanager
+async def _lifespan(app):
+    global _warmup_done
+    log.info("main importé en %.2f s", STARTUP_SECONDS.get("import"))
+    if STARTUP_WARMUP == "blocking":
+        await run_in_threadpool(_warm_up)
+    elif STARTUP_WARMUP == "background":
+        # /health répond pendant le warm-up ; une requête qui arrive avant attend l'import en cours
+        _warmup_done = threading.Event()
+        threading.Thread(target=_warm_up, args=(_warmup_done,), name="marchia-warmup", daemon=True).start()
+    yield
+    WORKER_POOL.shutdown()
+    JOBS.shutdown()
+
+app = FastAPI(lifespan=_lifespan, default_response_class=FastJSONResponse)
+WORKER_POOL = BoundedPool.from_env()
+RESULT_CACHE = ResultCache.from_env()
+JOBS = JobManager.from_env()
+# uploads plafonnés à la réception (avant spool disque et hachage) ; dans MetricsMiddleware, pour compter les 413
+app.add_middleware(BodyLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+app.add_middleware(MetricsMiddleware, routes=app.router.routes, profiler=SamplingProfiler.from_env())
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
 # ---------- Modèles ----------
 class LigneQuantitative(BaseModel):
@@ -31,20 +128,32 @@ class FicheRequest(BaseModel):
     lot: str
     descriptif: str
     lignes: Optional[List[LigneQuantitative]] = None
+    champs: Optional[Dict[str, str]] = None  # {{nom}} supplémentaires du template
 
-# ---------- Helpers DOCX ----------
-def find_paragraph(doc: Document, needles: List[str]) -> Optional[Paragraph]:
-    for p in doc.paragraphs:
-        for n in needles:
-            if n in p.text:
-                return p
-    return None
+class Ligne(NamedTuple):
+    """Ligne quantitative interne, produite par les lecteurs CSV/XLSX (champs déjà typés, pas de validation).
 
+    Mêmes champs que LigneQuantitative, qui reste le modèle validé de l'API ; le rendu accepte les deux.
+    """
+    rep: str
+    dim: str
+    typo: str
+    perf: str
+    qte: int
+    pose: str
+    commentaire: str = ""
+
+AnyLigne = Union[Ligne, LigneQuantitative]
+_LIGNES_JSON = TypeAdapter(List[LigneQuantitative])
+
+# ---------- Helpers DOCX ----------
 def block_items(doc: Document):
     """Yield Paragraph/Table dans l'ordre d'apparition (de haut en bas)."""
     body = doc._element.body
     from docx.oxml.text.paragraph import CT_P
     from docx.oxml.table import CT_Tbl
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
     for child in body.iterchildren():
         if isinstance(child, CT_P):
             yield Paragraph(child, doc)
@@ -67,6 +176,7 @@ def clear_table_body_keep_header(table: Table):
 
 def zero_cell_spacing(table: Table):
     """Espace avant/après = 0 dans toutes les cellules (évite les blancs parasites)."""
+    from docx.shared import Pt
     for row in table.rows:
         for cell in row.cells:
             for p in cell.paragraphs:
@@ -88,6 +198,8 @@ def cleanup_after_marker(marker_par: Paragraph, doc: Document) -> Optional[Table
         "📌Rép.", "📐Dim.", "🧩Typo.", "🎯", "🏷", "🔧", "🧾",
         "Rép.", "Dim.", "Typo.", "Perf.", "Qté", "Pose", "Commentaire"
     }
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
     items = list(block_items(doc))
     try:
         idx = next(i for i, it in enumerate(items) if isinstance(it, Paragraph) and it._p is marker_par._p)
@@ -111,67 +223,202 @@ def cleanup_after_marker(marker_par: Paragraph, doc: Document) -> Optional[Table
         j += 1
     return first_table
 
-def build_doc(req: FicheRequest) -> bytes:
-    doc = Document(TEMPLATE_PATH)
+# ---------- Cache template ----------
+DESC_MARKER = "DESCRIPTIF_CCTP"
+TABLE_MARKER = "TABLEAU_QUANTITATIF"
+TABLE_HEADERS = ["Rép.", "Dim.", "Typo.", "Perf. (Uw / Rw+Ctr)", "Qté", "Pose", "Commentaire"]
+TABLE_WIDTHS = [6, 9, 30, 16, 5, 12, 22]  # proportions des colonnes (export PDF)
+
+def _clone_document(doc: Document) -> Document:
+    """Copie profonde de document.xml uniquement ; styles, médias, thème… restent partagés (lecture seule)."""
+    main_part = doc.part
+    package = main_part.package
+    memo = {id(p): p for p in package.iter_parts() if p is not main_part}
+    return copy.deepcopy(package, memo).main_document_part.document
+
+def _prepare_table(doc: Document, p_tbl: Paragraph) -> Table:
+    """Nettoie la zone après le marqueur et renvoie le tableau destination vidé (entête conservée)."""
+    from docx.enum.text import WD_BREAK
+    p_tbl.text = ""
+    run = p_tbl.add_run()
+    run.add_break(WD_BREAK.PAGE)
     try:
-        normal = doc.styles["Normal"]
-        normal.font.name = "Calibri"
-        normal.font.size = Pt(11)
+        next_idx = doc.paragraphs.index(p_tbl) + 1
+        if next_idx < len(doc.paragraphs):
+            doc.paragraphs[next_idx].paragraph_format.page_break_before = False
     except Exception:
         pass
-    for p in doc.paragraphs:
-        if "{{projet}}" in p.text:
-            p.text = p.text.replace("{{projet}}", req.projet)
-        if "{{moa}}" in p.text:
-            p.text = p.text.replace("{{moa}}", req.moa)
-        if "{{lot}}" in p.text:
-            p.text = p.text.replace("{{lot}}", req.lot)
-    p_desc = find_paragraph(doc, ["[[DESCRIPTIF_CCTP]]", "{{DESCRIPTIF_CCTP}}"])
-    if p_desc:
-        p_desc.text = req.descriptif
-    p_tbl = find_paragraph(doc, ["[[TABLEAU_QUANTITATIF]]", "{{TABLEAU_QUANTITATIF}}"])
-    if p_tbl and req.lignes:
-        p_tbl.text = ""
-        run = p_tbl.add_run()
-        run.add_break(WD_BREAK.PAGE)
-        try:
-            next_idx = doc.paragraphs.index(p_tbl) + 1
-            if next_idx < len(doc.paragraphs):
-                doc.paragraphs[next_idx].paragraph_format.page_break_before = False
-        except Exception:
-            pass
-        existing_table = cleanup_after_marker(p_tbl, doc)
-        headers = ["Rép.", "Dim.", "Typo.", "Perf. (Uw / Rw+Ctr)", "Qté", "Pose", "Commentaire"]
-        if existing_table is None:
-            dest_table = doc.add_table(rows=1, cols=len(headers))
-            hdr = dest_table.rows[0].cells
-            for i, h in enumerate(headers):
-                hdr[i].text = h
-            p_tbl._p.addnext(dest_table._tbl)
-        else:
-            dest_table = existing_table
-            move_table_after_paragraph(dest_table, p_tbl)
-            clear_table_body_keep_header(dest_table)
-            hdr = dest_table.rows[0].cells
-            for i, h in enumerate(headers[:len(hdr)]):
-                hdr[i].text = h
-        for L in (req.lignes or []):
-            row = dest_table.add_row().cells
-            row[0].text = L.rep
-            row[1].text = L.dim
-            row[2].text = L.typo
-            row[3].text = L.perf
-            row[4].text = str(int(L.qte))
-            row[5].text = L.pose
-            row[6].text = (L.commentaire or "").strip()
+    existing_table = cleanup_after_marker(p_tbl, doc)
+    if existing_table is None:
+        dest_table = doc.add_table(rows=1, cols=len(TABLE_HEADERS))
+        hdr = dest_table.rows[0].cells
+        for i, h in enumerate(TABLE_HEADERS):
+            hdr[i].text = h
+        p_tbl._p.addnext(dest_table._tbl)
+    else:
+        dest_table = existing_table
+        move_table_after_paragraph(dest_table, p_tbl)
+        clear_table_body_keep_header(dest_table)
+        hdr = dest_table.rows[0].cells
+        for i, h in enumerate(TABLE_HEADERS[:len(hdr)]):
+            hdr[i].text = h
+    try:
+        dest_table.style = "Table Grid"
+    except Exception:
+        pass
+    zero_cell_spacing(dest_table)
+    return dest_table
+
+def _row_prototype(table: Table):
+    """Ligne modèle détachée : un run par cellule, espacement déjà à zéro (plus de second passage)."""
+    from docx.oxml.ns import qn
+    from docx.shared import Pt
+    row = table.add_row()
+    for cell in row.cells:
+        cell.text = " "
+        pf = cell.paragraphs[0].paragraph_format
+        pf.space_before = Pt(0)
+        pf.space_after = Pt(0)
+    tr = row._tr
+    tr.getparent().remove(tr)
+    for t in tr.iter(qn("w:t")):
+        t.text = ""
+    return tr
+
+def _ligne_cells(L: AnyLigne) -> Tuple[str, ...]:
+    """Cellules d'une ligne, dans l'ordre de TABLE_HEADERS."""
+    return (L.rep, L.dim, L.typo, L.perf, str(int(L.qte)), L.pose, (L.commentaire or "").strip())
+
+def _emit_rows(tbl, proto, lignes: Iterable[AnyLigne]) -> None:
+    """Clone la ligne modèle pour chaque ligne quantitative et remplit directement les w:t."""
+    from docx.oxml.ns import qn
+    w_r, w_t = qn("w:r"), qn("w:t")
+    for L in lignes:
+        tr = copy.deepcopy(proto)
+        for run, value in zip(tr.iter(w_r), _ligne_cells(L)):
+            if "\n" in value or "\t" in value:
+                run.text = value
+            else:
+                run.find(w_t).text = value
+        tbl.append(tr)
+
+class TemplateCache:
+    """Template parsé une seule fois, rechargé quand son mtime change.
+
+    Deux variantes sont pré-calculées : brute (fiche sans lignes) et « tableau »
+    (marqueur nettoyé, tableau déplacé et vidé). Tous les placeholders sont indexés
+    en un parcours (utils.docx_template) ; chaque requête reçoit une copie. Chaque
+    variante garde aussi son paquet compressé (DocxSkeleton) : seul document.xml est
+    régénéré à l'écriture.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._digest = ""
+        # variante -> (document, index, paquet), remplacé d'un bloc au rechargement
+        self._variants: Dict[bool, Tuple[Document, Dict[str, object], DocxSkeleton]] = {}
+
+    def _prepare(self, blob: bytes, with_table: bool) -> Tuple[Document, Dict[str, object]]:
+        from docx import Document
+        from docx.shared import Pt
+        from docx.text.paragraph import Paragraph
+        from utils.docx_template import index_template, marker_paragraph
+        doc = Document(BytesIO(blob))
         try:
-            dest_table.style = "Table Grid"
+            normal = doc.styles["Normal"]
+            normal.font.name = "Calibri"
+            normal.font.size = Pt(11)
         except Exception:
             pass
-        zero_cell_spacing(dest_table)
-    buf = BytesIO()
-    doc.save(buf)
-    return buf.getvalue()
+        body = doc.element.body
+        tpl = index_template(body)
+        dest_table = None
+        if with_table and tpl.row("ligne") is None:
+            p_tbl = marker_paragraph(body, tpl, TABLE_MARKER)
+            if p_tbl is not None and p_tbl.getparent() is body:
+                dest_table = _prepare_table(doc, Paragraph(p_tbl, doc))
+                tpl = index_template(body)
+        index = {
+            "template": tpl,
+            "table": body.index(dest_table._tbl) if dest_table is not None else None,
+            "row_proto": _row_prototype(dest_table) if dest_table is not None else None,
+        }
+        return doc, index
+
+    def load(self) -> None:
+        from utils.docx_stream import DocxSkeleton
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with stage("template_load"):
+                with open(self.path, "rb") as f:
+                    blob = f.read()
+                variants = {k: self._prepare(blob, k) for k in (False, True)}
+                self._variants = {k: (doc, index, DocxSkeleton.from_document(doc)) for k, (doc, index) in variants.items()}
+            self._digest = hashlib.sha256(blob).hexdigest()
+            self._mtime = mtime
+
+    @property
+    def digest(self) -> str:
+        """Empreinte SHA-256 du template courant (entre dans les clés du cache de résultats)."""
+        self.load()
+        return self._digest
+
+    def get(self, with_table: bool) -> Tuple[Document, Dict[str, object], DocxSkeleton]:
+        """Copie du document, index et paquet d'une même génération du template."""
+        self.load()
+        doc, index, skeleton = self._variants[with_table]
+        return _clone_document(doc), index, skeleton
+
+TEMPLATE_CACHE = TemplateCache(TEMPLATE_PATH)
+
+def _ligne_values(L: AnyLigne) -> Dict[str, str]:
+    return {
+        "rep": L.rep, "dim": L.dim, "typo": L.typo, "perf": L.perf,
+        "qte": str(int(L.qte)), "pose": L.pose, "commentaire": (L.commentaire or "").strip(),
+    }
+
+def render_document(req: FicheRequest, lignes: Optional[Iterable[AnyLigne]] = None) -> Tuple[DocxSkeleton, bytes]:
+    """(paquet, word/document.xml) de la fiche : tout le travail CPU, sans écrire le paquet.
+
+    Le paquet est celui de la génération du template qui a servi au rendu : un rechargement
+    avant l'écriture de la réponse ne mélange pas ancien document.xml et nouveaux médias.
+
+    `lignes` (consommé une seule fois) remplace req.lignes : un quantitatif lu en flux
+    passe directement du lecteur au tableau, sans liste intermédiaire.
+    """
+    from utils.docx_stream import document_xml
+    from utils.docx_template import render
+    rows = iter((req.lignes or []) if lignes is None else lignes)
+    first = next(rows, None)
+    with_table = first is not None
+    rows = itertools.chain([first], rows) if with_table else rows
+    with stage("template_clone"):
+        doc, index, skeleton = TEMPLATE_CACHE.get(with_table)
+    body = doc.element.body
+    tpl = index["template"]
+    values: Dict[str, object] = dict(req.champs or {})
+    values.update({"projet": req.projet, "moa": req.moa, "lot": req.lot, DESC_MARKER: req.descriptif})
+    with stage("render_fields"):
+        if with_table and tpl.row("ligne") is not None:
+            values["ligne"] = [_ligne_values(L) for L in rows]
+        render(body, tpl, values)
+    if with_table and index["table"] is not None:
+        with stage("table_rows"):
+            _emit_rows(body[index["table"]], index["row_proto"], rows)
+    with stage("serialize_xml"):
+        return skeleton, document_xml(doc)
+
+def docx_chunks(skeleton: DocxSkeleton, xml: bytes) -> Iterator[bytes]:
+    return timed_iter("docx_write", skeleton.stream(xml))
+
+def build_doc(req: FicheRequest, lignes: Optional[Iterable[AnyLigne]] = None) -> bytes:
+    return b"".join(docx_chunks(*render_document(req, lignes)))
 
 # ---------- Helpers DCE ----------
 KEYWORDS_QUANT = re.compile(r"(quant|dpgf|bpu|bordereau|dqe|estimatif)", re.I)
@@ -186,39 +433,77 @@ SYNONYMS: Dict[str, List[str]] = {
     "commentaire": ["commentaire", "observations", "remarques", "note"],
 }
 
+# Moteur d'entêtes compilé une fois depuis SYNONYMS (à recharger via _compile_synonyms si modifié).
+_FOLD = str.maketrans({"œ": "oe", "é": "e", "è": "e", "ê": "e", "à": "a", "î": "i"})
+_NON_KEY = re.compile(r"[^a-z0-9.]+")
+_TRIE_END = ""
+
+@lru_cache(maxsize=4096)
 def _norm_key(s: str) -> str:
-    s = (s or "").strip().lower()
-    s = s.replace("œ", "oe").replace("é", "e").replace("è", "e").replace("ê", "e").replace("à", "a").replace("î", "i")
-    s = re.sub(r"[^a-z0-9\. ]", " ", s)
-    s = re.sub(r"\s+", " ", s)
-    return s
+    return _NON_KEY.sub(" ", (s or "").strip().lower().translate(_FOLD))
 
-def _map_headers(headers: List[str]) -> Dict[str, Optional[int]]:
+def _compile_synonyms(synonyms: Dict[str, List[str]]) -> dict:
+    """Trie de préfixes : chaque nœud terminal porte les cibles (rep, dim…) du synonyme."""
+    root: dict = {}
+    for target, syns in synonyms.items():
+        for s in syns:
+            node = root
+            for ch in s:
+                node = node.setdefault(ch, {})
+            node.setdefault(_TRIE_END, []).append(target)
+    return root
+
+_SYNONYM_TRIE = _compile_synonyms(SYNONYMS)
+
+def _prefix_targets(key: str) -> List[str]:
+    """Cibles dont un synonyme est préfixe de `key` (un seul parcours du trie)."""
+    hits: List[str] = []
+    node = _SYNONYM_TRIE
+    for ch in key:
+        node = node.get(ch)
+        if node is None:
+            break
+        hits.extend(node.get(_TRIE_END, ()))
+    return hits
+
+@lru_cache(maxsize=1024)
+def _mapping_for_signature(headers: Tuple[str, ...]) -> Tuple[Tuple[str, Optional[int]], ...]:
     idx = { _norm_key(h): i for i, h in enumerate(headers) }
-    mapping = {k: None for k in SYNONYMS.keys()}
-    for target, syns in SYNONYMS.items():
-        for raw_h, i in idx.items():
-            if raw_h in syns or any(raw_h.startswith(s) for s in syns):
+    mapping: Dict[str, Optional[int]] = {k: None for k in SYNONYMS.keys()}
+    for raw_h, i in idx.items():
+        for target in _prefix_targets(raw_h):
+            if mapping[target] is None:
                 mapping[target] = i
-                break
-    return mapping
+    if mapping["typo"] is None:
+        mapping["typo"] = next((j for j, h in enumerate(headers) if _norm_key(h).startswith(("designation", "description"))), None)
+    if mapping["qte"] is None:
+        mapping["qte"] = next((j for j, h in enumerate(headers) if _norm_key(h).startswith("quantite") or _norm_key(h) in ("qte", "q")), None)
+    return tuple(mapping.items())
+
+def _map_headers(headers: List[str]) -> Dict[str, Optional[int]]:
+    """Colonne de chaque cible (premier entête dont un synonyme est préfixe), mémoïsé par signature d'entêtes."""
+    return dict(_mapping_for_signature(tuple(headers)))
+
+_PERF_RES = [
+    re.compile(r"\bEI\s*[\d]{1,2}\b", re.I),
+    re.compile(r"Rw\+?Ctr\s*[=≥]?\s*[\d]{1,2}\s*dB", re.I),
+    re.compile(r"Uw\s*[=≤]?\s*[\d][\.,]\d+\s*W", re.I),
+]
+_DIM_RE = re.compile(r"\b(\d{3,4})\s*[xX]\s*(\d{3,4})\b")
 
 def _extract_perf_from_text(txt: str) -> str:
     if not txt:
         return ""
     hits = []
-    m = re.findall(r"\bEI\s*[\d]{1,2}\b", txt, flags=re.I)
-    if m: hits.append(", ".join(sorted(set(m))))
-    m = re.findall(r"Rw\+?Ctr\s*[=≥]?\s*[\d]{1,2}\s*dB", txt, flags=re.I)
-    if m: hits.append(", ".join(sorted(set(m))))
-    m = re.findall(r"Uw\s*[=≤]?\s*[\d][\.,]\d+\s*W", txt, flags=re.I)
-    if m: hits.append(", ".join(sorted(set(m))))
+    for rx in _PERF_RES:
+        m = rx.findall(txt)
+        if m: hits.append(", ".join(sorted(set(m))))
     return " / ".join(hits)
 
 def _extract_dim_from_text(txt: str) -> str:
     if not txt:
         return ""
-    m = re.search(r"\b(\d{3,4})\s*[xX]\s*(\d{3,4})\b", txt)
+    m = _DIM_RE.search(txt)
     if m:
         return f"{m.group(1)}x{m.group(2)}"
     return ""
@@ -235,39 +520,33 @@ def _guess_meta_from_names(zipname: str, names: List[str]) -> Tuple[str, str]:
     lot = (lot.strip().title() or "Lot Non Précisé")
     return projet, lot
 
-def _read_csv_quant(raw: str) -> List[LigneQuantitative]:
+def _sniff_delimiter(sample: str) -> str:
     try:
-        dialect = csv.Sniffer().sniff(raw[:4096], delimiters=",;")
-        delim = dialect.delimiter
+        return csv.Sniffer().sniff(sample[:4096], delimiters=",;").delimiter
     except Exception:
-        delim = ","
-    reader = csv.reader(raw.splitlines(), delimiter=delim)
-    rows = list(reader)
-    if not rows:
-        return []
-    headers = rows[0]
+        return ","
+
+def _read_csv_quant(raw: str) -> List[Ligne]:
+    delim = _sniff_delimiter(raw)
+    if _use_columnar(len(raw)):
+        lignes = _read_csv_quant_df(raw, delim)
+        if lignes is not None:
+            return lignes
+    return list(_iter_csv_quant(raw.splitlines(), delim))
+
+def _iter_csv_quant(lines: Iterable[str], delim: str) -> Iterator[Ligne]:
+    """Lignes quantitatives d'un CSV, générées au fil de la lecture de `lines`."""
+    reader = csv.reader(lines, delimiter=delim)
+    headers = next(reader, None)
+    if not headers:
+        return
     mapping = _map_headers(headers)
-    has_design = mapping["typo"] is not None or any(_norm_key(h).startswith(("designation","description")) for h in headers)
-    has_qty = mapping["qte"] is not None or any(_norm_key(h).startswith("quantite") or _norm_key(h) in ("qte","q") for h in headers)
-    lignes: List[LigneQuantitative] = []
-    for i, r in enumerate(rows[1:], start=1):
+    for i, r in enumerate(reader, start=1):
         cells = r + [""] * max(0, len(headers) - len(r))
         def val(idx_opt, default=""):
             return (cells[idx_opt] if idx_opt is not None and idx_opt < len(cells) else default).strip()
         if not any(c.strip() for c in cells):
             continue
-        if mapping["typo"] is None and has_design:
-            try:
-                j = next(j for j,h in enumerate(headers) if _norm_key(h).startswith(("designation","description")))
-                mapping["typo"] = j
-            except StopIteration:
-                pass
-        if mapping["qte"] is None and has_qty:
-            try:
-                j = next(j for j,h in enumerate(headers) if _norm_key(h).startswith("quantite") or _norm_key(h) in ("qte","q"))
-                mapping["qte"] = j
-            except StopIteration:
-                pass
         typo = val(mapping["typo"]) if mapping["typo"] is not None else ""
         qraw = val(mapping["qte"]) if mapping["qte"] is not None else ""
         if not (typo and (qraw or qraw=="0")):
@@ -281,52 +560,53 @@ def _read_csv_quant(raw: str) -> List[LigneQuantitative]:
         perf = val(mapping["perf"]) if mapping["perf"] is not None else _extract_perf_from_text(typo)
         pose = val(mapping["pose"]) if mapping["pose"] is not None else ""
         com  = val(mapping["commentaire"]) if mapping["commentaire"] is not None else ""
-        lignes.append(LigneQuantitative(rep=rep, dim=dim, typo=typo, perf=perf, qte=qte, pose=pose, commentaire=com))
-    return lignes
+        yield Ligne(rep, dim, typo, perf, qte, pose, com)
 
-def _try_read_xlsx_quant(data: bytes) -> List[LigneQuantitative]:
+def _iter_xlsx_sheets(data: bytes) -> Iterator[Tuple[List[str], Dict[str, Optional[int]], int, Iterator[tuple]]]:
+    """Feuilles exploitables, en flux (read_only) : (entêtes, mapping, n° de ligne d'entête, lignes suivantes).
+
+    L'entête est cherchée dans les 20 premières lignes et mappée une fois ; les feuilles
+    suivantes ne sont ouvertes que si l'appelant continue l'itération.
+    """
     try:
         import openpyxl  # type: ignore
     except Exception:
-        return []
-    wb = openpyxl.load_workbook(BytesIO(data), data_only=True)
-    lignes: List[LigneQuantitative] = []
-    for ws in wb.worksheets:
-        header_row = None
-        for r in ws.iter_rows(min_row=1, max_row=20, values_only=True):
-            vals = [str(c).strip() for c in (r or []) if c not in (None, "")]
-            if len(vals) >= 2:
-                header_row = r
-                break
-        if not header_row:
-            continue
-        headers = [str(c or "").strip() for c in header_row]
-        mapping = _map_headers(headers)
-        has_design = mapping["typo"] is not None or any(_norm_key(h).startswith(("designation","description")) for h in headers)
-        has_qty = mapping["qte"] is not None or any(_norm_key(h).startswith("quantite") or _norm_key(h) in ("qte","q") for h in headers)
-        if not (has_design and has_qty):
-            continue
-        start_row = 2
-        for i in range(start_row, ws.max_row + 1):
-            row = [ws.cell(row=i, column=j+1).value for j in range(len(headers))]
-            cells = [str(c or "").strip() for c in row]
+        return
+    wb = openpyxl.load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            # en read_only, iter_rows s'arrête à la balise <dimension>, parfois périmée selon l'exportateur
+            ws.reset_dimensions()
+            header_row, header_idx = None, 0
+            for header_idx, r in enumerate(ws.iter_rows(min_row=1, max_row=20, values_only=True), start=1):
+                vals = [str(c).strip() for c in (r or []) if c not in (None, "")]
+                if len(vals) >= 2:
+                    header_row = r
+                    break
+            if not header_row:
+                continue
+            headers = [str(c or "").strip() for c in header_row]
+            mapping = _map_headers(headers)
+            if mapping["typo"] is None or mapping["qte"] is None:
+                continue
+            yield headers, mapping, header_idx, ws.iter_rows(min_row=header_idx + 1, values_only=True)
+    finally:
+        wb.close()
+
+def _iter_xlsx_quant(data: bytes) -> Iterator[Ligne]:
+    """Lignes de la première feuille exploitable qui en produit, générées au fil de la lecture."""
+    for headers, mapping, header_idx, rows in _iter_xlsx_sheets(data):
+        width = len(headers)
+        found = False
+        for i, row in enumerate(rows, start=header_idx + 1):
+            cells = [str(c or "").strip() for c in row[:width]]
+            cells += [""] * (width - len(cells))
             if all(c == "" for c in cells):
                 continue
             def val(idx_opt, default=""):
                 return (cells[idx_opt] if idx_opt is not None and idx_opt < len(cells) else default).strip()
-            if mapping["typo"] is None and has_design:
-                try:
-                    j = next(j for j,h in enumerate(headers) if _norm_key(h).startswith(("designation","description")))
-                    mapping["typo"] = j
-                except StopIteration:
-                    pass
-            if mapping["qte"] is None and has_qty:
-                try:
-                    j = next(j for j,h in enumerate(headers) if _norm_key(h).startsWith("quantite") or _norm_key(h) in ("qte","q"))
-                except Exception:
-                    pass
-            typo = val(mapping["typo"]) if mapping["typo"] is not None else ""
-            qraw = val(mapping["qte"]) if mapping["qte"] is not None else ""
+            typo = val(mapping["typo"])
+            qraw = val(mapping["qte"])
             if not (typo and (qraw or qraw=="0")):
                 continue
             try:
@@ -338,10 +618,17 @@ def _try_read_xlsx_quant(data: bytes) -> List[LigneQuantitative]:
             perf = val(mapping["perf"]) if mapping["perf"] is not None else _extract_perf_from_text(typo)
             pose = val(mapping["pose"]) if mapping["pose"] is not None else ""
             com  = val(mapping["commentaire"]) if mapping["commentaire"] is not None else ""
-            lignes.append(LigneQuantitative(rep=rep, dim=dim, typo=typo, perf=perf, qte=qte, pose=pose, commentaire=com))
-        if lignes:
+            found = True
+            yield Ligne(rep, dim, typo, perf, qte, pose, com)
+        if found:
             break
-    return lignes
+
+def _try_read_xlsx_quant(data: bytes) -> List[Ligne]:
+    if _use_columnar(len(data)):
+        lignes = _read_xlsx_quant_df(data)
+        if lignes is not None:
+            return lignes
+    return list(_iter_xlsx_quant(data))
 
 def _find_quant_file(names: List[str]) -> Optional[str]:
     candidates = []
@@ -364,6 +651,539 @@ def _find_quant_file(names: List[str]) -> Optional[str]:
     candidates.sort(reverse=True)
     return candidates[0][2]
 
+# ---------- Mode colonnaire (pandas) ----------
+_EOL = re.compile(r"\r\n|\r|\n")
+
+def _use_columnar(size: int) -> bool:
+    """QUANT_PARSER=python|pandas|auto ; en auto, pandas au-delà de QUANT_COLUMNAR_MIN_BYTES."""
+    if QUANT_PARSER == "auto":
+        return size >= QUANT_COLUMNAR_MIN_BYTES
+    return QUANT_PARSER == "pandas"
+
+def _map_unique(s, fn):
+    """Applique `fn` une seule fois par valeur distincte (les désignations se répètent beaucoup)."""
+    import pandas as pd  # type: ignore
+    uniq = pd.unique(s)
+    return s.map(dict(zip(uniq, map(fn, uniq))))
+
+def _lignes_from_frame(df, mapping: Dict[str, Optional[int]], first_line: int) -> List[Ligne]:
+    """Même logique que les lecteurs ligne à ligne, colonne par colonne.
+
+    `df` : cellules str, colonnes 0..n-1 alignées sur les entêtes ; l'index (à partir
+    de 0) + `first_line` donne le numéro utilisé pour les repères par défaut.
+    """
+    import pandas as pd  # type: ignore
+    def col(key):
+        j = mapping[key]
+        return df[j].str.strip() if j is not None and j in df.columns else None
+    typo, qraw = col("typo"), col("qte")
+    if typo is None or qraw is None:
+        return []
+    keep = (typo != "") & (qraw != "")
+    if not keep.any():
+        return []
+    df, typo, qraw = df[keep], typo[keep], qraw[keep]
+    qte = pd.to_numeric(qraw.str.replace(",", ".", regex=False), errors="coerce")
+    qte = qte.where(qte.abs() < 2**63, 0).fillna(0).astype("int64")
+    empty = pd.Series("", index=df.index, dtype=object)
+    rep = col("rep")
+    if rep is None:
+        rep = "L" + (df.index + first_line).astype(str).to_series(index=df.index)
+    dim = col("dim")
+    if dim is None:
+        m = typo.str.extract(_DIM_RE)
+        dim = (m[0] + "x" + m[1]).fillna("")
+    perf = col("perf")
+    if perf is None:
+        perf = _map_unique(typo, _extract_perf_from_text)
+    pose = col("pose")
+    com = col("commentaire")
+    cols = [rep, dim, typo, perf, qte, empty if pose is None else pose, empty if com is None else com]
+    return list(map(Ligne._make, zip(*(s.tolist() for s in cols))))
+
+def _read_csv_quant_df(raw: str, delim: str) -> Optional[List[Ligne]]:
+    """CSV → DataFrame (moteur C) ; None si pandas est indisponible.
+
+    Seule différence avec le lecteur ligne à ligne : un champ entre guillemets
+    sur plusieurs lignes y reste d'un seul tenant.
+    """
+    try:
+        import pandas as pd  # type: ignore
+    except Exception:
+        return None
+    headers = next(csv.reader([_EOL.split(raw, 1)[0]], delimiter=delim), [])
+    if not headers:
+        return []
+    width = len(headers)
+    opts = dict(sep=delim, header=None, skiprows=1, names=range(width), dtype=str, na_filter=False, skip_blank_lines=False)
+    try:
+        # usecols tronque les lignes trop longues mais échoue si aucune n'atteint la largeur de l'entête
+        df = pd.read_csv(StringIO(raw), usecols=range(width), **opts)
+    except pd.errors.EmptyDataError:
+        return []
+    except pd.errors.ParserError:
+        try:
+            df = pd.read_csv(StringIO(raw), index_col=False, **opts)
+        except pd.errors.EmptyDataError:
+            return []
+        except pd.errors.ParserError:
+            return None
+    return _lignes_from_frame(df, _map_headers(headers), first_line=1)
+
+def _read_xlsx_quant_df(data: bytes) -> Optional[List[Ligne]]:
+    """Feuilles lues en flux comme _iter_xlsx_quant, puis traitées en colonnes ; None sans pandas."""
+    try:
+        import pandas as pd  # type: ignore
+    except Exception:
+        return None
+    for headers, mapping, header_idx, rows in _iter_xlsx_sheets(data):
+        width = len(headers)
+        # règle str(c or "") cellule par cellule, comme _iter_xlsx_quant : une colonne numérique
+        # trouée ne doit pas passer en float64 (repère 101 -> "101.0")
+        df = pd.DataFrame([[str(c or "") for c in r[:width]] for r in rows], dtype=object)
+        if df.empty:
+            continue
+        df = df.reindex(columns=range(width)).fillna("")
+        lignes = _lignes_from_frame(df, mapping, first_line=header_idx)
+        if lignes:
+            return lignes
+    return []
+
+def _check_upload_size(file: UploadFile) -> None:
+    """413 au-delà de MAX_UPLOAD_BYTES ; le corps de la requête est déjà plafonné par BodyLimitMiddleware."""
+    f = file.file
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Fichier trop volumineux (max {MAX_UPLOAD_BYTES // (1024 * 1024)} Mo).")
+
+def _open_upload_zip(file: UploadFile) -> zipfile.ZipFile:
+    """Ouvre le ZIP sur le fichier spoolé par Starlette (sur disque au-delà de 1 Mo), sans copie en RAM.
+
+    Seul le répertoire central est lu ; les membres sont décompressés à la demande.
+    """
+    _check_upload_size(file)
+    f = file.file
+    try:
+        with stage("zip_scan"):
+            return zipfile.ZipFile(f)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Fichier non valide: ZIP attendu.")
+
+def _check_member(zf: zipfile.ZipFile, name: str) -> None:
+    if zf.getinfo(name).file_size > MAX_MEMBER_BYTES:
+        raise HTTPException(status_code=413, detail=f"'{os.path.basename(name)}' trop volumineux une fois décompressé.")
+
+def _read_member(zf: zipfile.ZipFile, name: str) -> bytes:
+    _check_member(zf, name)
+    with stage("zip_read"):
+        return zf.read(name)
+
+def _spool_members(zf: zipfile.ZipFile, names: List[str], dest: str) -> List[str]:
+    """Copie les membres par blocs dans `dest` (sans les charger en mémoire) ; renvoie les chemins, dans l'ordre."""
+    paths = []
+    for i, name in enumerate(names):
+        _check_member(zf, name)
+        path = os.path.join(dest, f"{i}{os.path.splitext(name)[1].lower()}")
+        with stage("zip_read"), zf.open(name) as src, open(path, "wb") as out:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        paths.append(path)
+    return paths
+
+def _decode_text(raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+# ---------- Quantitatif en flux ----------
+CSV_SAMPLE_BYTES = 64 * 1024
+
+def _latin1_fallback(err: UnicodeDecodeError):
+    # octets non UTF-8 au-delà de l'échantillon : relus en latin-1 sans tout redécoder
+    return err.object[err.start:err.end].decode("latin-1"), err.end
+
+codecs.register_error("marchia-latin1", _latin1_fallback)
+
+class _Prefixed(io.RawIOBase):
+    """Flux binaire : l'échantillon déjà lu, puis la suite du membre (décompressé une seule fois)."""
+
+    def __init__(self, head: bytes, raw):
+        self._head = memoryview(head)
+        self._raw = raw
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._head:
+            n = min(len(b), len(self._head))
+            b[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+        return self._raw.readinto(b)
+
+    def close(self) -> None:
+        self._raw.close()
+        super().close()
+
+def _sniff_encoding(sample: bytes) -> str:
+    """Même choix que _decode_text (utf-8-sig, sinon latin-1), sur un échantillon."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+def _open_csv_member(zf: zipfile.ZipFile, name: str) -> Tuple[io.TextIOWrapper, str]:
+    """(texte décodé au fil de la lecture, délimiteur), d'après les CSV_SAMPLE_BYTES premiers octets."""
+    raw = zf.open(name)
+    head = raw.read(CSV_SAMPLE_BYTES)
+    encoding = _sniff_encoding(head)
+    delim = _sniff_delimiter(head[:8192].decode(encoding, errors="ignore"))
+    text = io.TextIOWrapper(
+        io.BufferedReader(_Prefixed(head, raw), buffer_size=CSV_SAMPLE_BYTES),
+        encoding=encoding, errors="strict" if encoding == "latin-1" else "marchia-latin1", newline="",
+    )
+    return text, delim
+
+def _iter_quant_member(zf: zipfile.ZipFile, name: str) -> Iterator[Ligne]:
+    """Lignes d'un quantitatif du ZIP, générées à la demande ; un CSV n'est jamais entier en mémoire.
+
+    Un XLSX (archive à accès aléatoire) est lu entier, mais ses lignes restent générées en flux.
+    """
+    fmt = os.path.splitext(name.lower())[1].lstrip(".")
+    _check_member(zf, name)
+    n = 0
+    try:
+        if fmt == "csv":
+            text, delim = _open_csv_member(zf, name)
+            with text:
+                for n, ligne in enumerate(timed_iter("parse_csv", _iter_csv_quant(text, delim)), start=1):
+                    yield ligne
+        elif fmt == "xlsx":
+            for n, ligne in enumerate(timed_iter("parse_xlsx", _iter_xlsx_quant(_read_member(zf, name))), start=1):
+                yield ligne
+    finally:
+        if n:
+            count_rows(n, fmt)
+
+def _render_quant_member(req: FicheRequest, zf: zipfile.ZipFile, name: str, empty_detail: str) -> Tuple[DocxSkeleton, bytes]:
+    """Lecture du quantitatif et rendu de la fiche en une passe (400 si aucune ligne exploitable)."""
+    rows = _iter_quant_member(zf, name)
+    first = next(rows, None)
+    if first is None:
+        raise HTTPException(status_code=400, detail=empty_detail)
+    return render_document(req, itertools.chain([first], rows))
+
+def _render_quant_bytes(req: FicheRequest, name: str, data: bytes) -> Optional[Tuple[DocxSkeleton, bytes]]:
+    """Comme _render_quant_member, à partir du membre déjà lu ; None si aucune ligne exploitable."""
+    lignes = _read_quant_member(name, data)
+    return render_document(req, lignes) if lignes else None
+
+async def _render_quant_upload(req: FicheRequest, zf: zipfile.ZipFile, name: str, empty_detail: str) -> Tuple[DocxSkeleton, bytes]:
+    """Rendu dans le pool borné. En WORKER_MODE=process, ni le ZipFile (verrou, fichier spoolé) ni
+    HTTPException ne passent la frontière du processus : le membre est lu ici et transmis en octets."""
+    if WORKER_POOL.mode != "process":
+        return await _offload(_render_quant_member, req, zf, name, empty_detail)
+    data = await run_in_threadpool(_read_member, zf, name)
+    rendered = await _offload(_render_quant_bytes, req, name, data)
+    if rendered is None:
+        raise HTTPException(status_code=400, detail=empty_detail)
+    return rendered
+
+def _read_quant_member(name: str, data: bytes) -> List[Ligne]:
+    fmt = os.path.splitext(name.lower())[1].lstrip(".")
+    if fmt not in ("csv", "xlsx"):
+        return []
+    with stage(f"parse_{fmt}"):
+        lignes = _read_csv_quant(_decode_text(data)) if fmt == "csv" else _try_read_xlsx_quant(data)
+    count_rows(len(lignes), fmt)
+    return lignes
+
+def _read_quant_path(name: str, path: str) -> List[Ligne]:
+    with open(path, "rb") as f:
+        return _read_quant_member(name, f.read())
+
+def _read_meta(zf: zipfile.ZipFile, names: List[str]) -> dict:
+    meta_name = next((n for n in names if n.lower().endswith("meta.json")), None)
+    if not meta_name:
+        return {}
+    try:
+        return json.loads(_read_member(zf, meta_name).decode("utf-8-sig"))
+    except Exception:
+        return {}
+
+async def _offload(fn, *args):
+    """Exécute une étape CPU dans le pool borné ; 503 si la file est pleine, 504 au-delà du timeout."""
+    try:
+        return await WORKER_POOL.run(fn, *args)
+    except PoolSaturated:
+        raise HTTPException(status_code=503, detail="Serveur occupé, réessayez dans quelques secondes.", headers={"Retry-After": str(RETRY_AFTER_S)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Traitement trop long, abandonné.")
+
+# ---------- Cache de résultats ----------
+def _cache_key(*parts) -> str:
+    """Clé de contenu : version du service + empreinte du template + entrées canoniques."""
+    canon = json.dumps([__VERSION__, TEMPLATE_CACHE.digest, *parts], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canon.encode("utf-8")).hexdigest()
+
+def _hash_upload(file: UploadFile) -> str:
+    f = file.file
+    f.seek(0)
+    h = hashlib.sha256()
+    with stage("upload_read"):
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    f.seek(0)
+    return h.hexdigest()
+
+def _etag(key: str) -> str:
+    # faible : deux générations identiques diffèrent par les horodatages du ZIP
+    return f'W/"{key[:32]}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def _not_modified(key: str, if_none_match: Optional[str]) -> Optional[Response]:
+    etag = _etag(key)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def _content_disposition(filename: str) -> str:
+    """Nom ASCII de repli + forme RFC 5987 (les en-têtes HTTP sont en latin-1, les projets accentués)."""
+    ascii_name = filename.encode("ascii", "replace").decode("ascii").replace("?", "_").replace('"', "_")
+    if ascii_name == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+def _result_response(key: str, result: CachedResult) -> Response:
+    return Response(
+        content=result.content,
+        media_type=result.media_type,
+        headers={"Content-Disposition": _content_disposition(result.filename), "ETag": _etag(key)}
+    )
+
+def _stream_result(key: str, media_type: str, filename: str, chunks: Iterator[bytes]) -> StreamingResponse:
+    """Résultat écrit au fil de l'eau ; il n'entre en cache que si le flux va au bout.
+
+    Les morceaux ne sont gardés que tant que le total reste sous RESULT_CACHE.entry_limit :
+    au-delà, le cache le refuserait de toute façon et le flux continue sans mémoire.
+    """
+    def body() -> Iterator[bytes]:
+        parts: Optional[List[bytes]] = []
+        size, limit = 0, RESULT_CACHE.entry_limit
+        for chunk in chunks:
+            if parts is not None:
+                size += len(chunk)
+                if size > limit:
+                    parts = None
+                else:
+                    parts.append(chunk)
+            yield chunk
+        if parts is not None:
+            RESULT_CACHE.put(key, CachedResult(media_type, filename, b"".join(parts)))
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": _content_disposition(filename), "ETag": _etag(key)},
+    )
+
+def _stream_docx(key: str, filename: str, rendered: Tuple[DocxSkeleton, bytes]) -> StreamingResponse:
+    return _stream_result(key, DOCX_MEDIA_TYPE, filename, docx_chunks(*rendered))
+
+def _table_rows(req: FicheRequest, numeric_qte: bool = False) -> Iterator[tuple]:
+    for L in req.lignes or []:
+        cells = _ligne_cells(L)
+        yield cells[:4] + (int(L.qte),) + cells[5:] if numeric_qte else cells
+
+def _fiche_json_chunks(req: FicheRequest) -> Iterator[bytes]:
+    """Réponse de format=json : la fiche est sérialisée par pydantic, les lignes par paquets de JSON_BATCH_ROWS."""
+    head = json_dumps({"status": "ok", "message": "Fiche reçue correctement"})[:-1]
+    fields = req.model_dump_json(exclude={"lignes", "champs"}).encode("utf-8")[:-1]
+    yield head + b',"data":' + fields + b',"lignes":'
+    if req.lignes is None:
+        yield b"null"
+    else:
+        yield b"["
+        for i in range(0, len(req.lignes), JSON_BATCH_ROWS):
+            yield (b"," if i else b"") + _LIGNES_JSON.dump_json(req.lignes[i:i + JSON_BATCH_ROWS])[1:-1]
+        yield b"]"
+    yield b',"champs":' + json_dumps(req.champs) + b"}}"
+
+def _json_response(req: FicheRequest) -> Response:
+    """Sans passer par jsonable_encoder ; en flux au-delà de JSON_STREAM_MIN_ROWS lignes."""
+    chunks = timed_iter("export_json", _fiche_json_chunks(req))
+    if len(req.lignes or []) >= JSON_STREAM_MIN_ROWS:
+        return StreamingResponse(chunks, media_type=JSON_MEDIA_TYPE)
+    return Response(content=b"".join(chunks), media_type=JSON_MEDIA_TYPE)
+
+def _export_response(key: str, req: FicheRequest, format: str) -> Response:
+    """Quantitatif seul (xlsx, csv, pdf), sans passer par python-docx.
+
+    CSV et PDF partent en flux ; le XLSX, assemblé par openpyxl à l'enregistrement, est
+    renvoyé entier (avec Content-Length).
+    """
+    stem = f'quantitatif_{req.projet.replace(" ", "_")}'
+    if format == "csv":
+        return _stream_result(key, CSV_MEDIA_TYPE, f"{stem}.csv", timed_iter("export_csv", csv_chunks(TABLE_HEADERS, _table_rows(req))))
+    if format == "xlsx":
+        with stage("export_xlsx"):
+            result = CachedResult(XLSX_MEDIA_TYPE, f"{stem}.xlsx", xlsx_bytes(req.lot, TABLE_HEADERS, _table_rows(req, numeric_qte=True)))
+        RESULT_CACHE.put(key, result)
+        return _result_response(key, result)
+    title = " - ".join(x for x in (req.projet, req.lot, req.moa) if x)
+    return _stream_result(key, PDF_MEDIA_TYPE, f"{stem}.pdf", timed_iter("export_pdf", pdf_chunks(title, TABLE_HEADERS, TABLE_WIDTHS, _table_rows(req))))
+
+# ---------- Lot de fiches ----------
+class _ZipStream:
+    """Sortie non seekable pour zipfile : garde les octets écrits jusqu'au prochain drain()."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+async def _offload_waiting(fn, *args):
+    """Comme _offload, mais attend une place libre : les en-têtes d'un flux sont déjà partis, plus de 503 possible."""
+    return await WORKER_POOL.run_waiting(fn, *args)
+
+def _safe_name(s: str) -> str:
+    return re.sub(r"[\\/:*?\"<>|\s]+", "_", s).strip("_") or "fiche"
+
+async def _batch_fiche(req: FicheRequest, lignes: Optional[List[Ligne]] = None) -> bytes:
+    """Fiche DOCX d'un lot, via le même cache que /genere-fiche (template partagé par TEMPLATE_CACHE).
+
+    `lignes` (lues d'un quantitatif) remplace req.lignes ; la clé est celle de la même fiche postée en JSON.
+    """
+    payload = req.model_dump(mode="json")
+    if lignes is not None:
+        payload["lignes"] = [L._asdict() for L in lignes]
+    key = _cache_key("fiche", "docx", payload)
+    result = RESULT_CACHE.get(key)
+    if result is None:
+        content = await _offload_waiting(build_doc, req, lignes)
+        result = CachedResult(DOCX_MEDIA_TYPE, f'fiche_{req.projet.replace(" ", "_")}.docx', content)
+        RESULT_CACHE.put(key, result)
+    return result.content
+
+async def _stream_fiches_zip(jobs: List[Tuple[str, Callable[[], Awaitable[Tuple[FicheRequest, Optional[List[Ligne]]]]]]],
+                             spool: Optional[tempfile.TemporaryDirectory] = None) -> AsyncIterator[bytes]:
+    """Exécute les jobs (nom, fabrique async → (FicheRequest, lignes lues ou None)) en parallèle et écrit chaque fiche dans le ZIP dès qu'elle est prête.
+
+    Un `rapport.json` final liste les fiches produites et les erreurs. `spool` (fichiers lus
+    par les jobs) est supprimé à la fin du flux, qu'il aille au bout ou non ; s'il ne démarre
+    jamais, le finaliseur de TemporaryDirectory s'en charge quand le générateur est libéré.
+    """
+    out = _ZipStream()
+    zf = zipfile.ZipFile(out, "w", zipfile.ZIP_STORED)
+    sem = asyncio.Semaphore(WORKER_POOL.workers)
+
+    async def run(label, make_req):
+        async with sem:
+            try:
+                req, lignes = await make_req()
+                name = f"fiche_{_safe_name(req.projet)}_{_safe_name(req.lot)}.docx"
+                return label, name, await _batch_fiche(req, lignes), None
+            except HTTPException as e:
+                return label, None, None, str(e.detail)
+            except asyncio.TimeoutError:
+                return label, None, None, "Traitement trop long, abandonné."
+            except Exception as e:
+                return label, None, None, f"{type(e).__name__}: {e}"
+
+    tasks = [asyncio.ensure_future(run(label, make_req)) for label, make_req in jobs]
+    report, used = [], set()
+    try:
+        for fut in asyncio.as_completed(tasks):
+            label, name, content, error = await fut
+            if content is not None:
+                base, n = name, 1
+                while name in used:
+                    n += 1
+                    name = base.replace(".docx", f"_{n}.docx")
+                used.add(name)
+                zf.writestr(name, content)
+                report.append({"source": label, "fichier": name})
+                yield out.drain()
+            else:
+                report.append({"source": label, "erreur": error})
+        zf.writestr("rapport.json", json.dumps(report, ensure_ascii=False, indent=2))
+        zf.close()
+        yield out.drain()
+    finally:
+        for t in tasks:
+            t.cancel()
+        if spool is not None:
+            spool.cleanup()
+
+def _lot_from_member(name: str) -> str:
+    m = re.search(r"\blot\s*(?:n[oº°]?\s*\d+\s*)?([a-z0-9 \-_]+)", name, flags=re.I)
+    if m:
+        return m.group(0).strip().title()
+    return os.path.splitext(os.path.basename(name))[0]
+
+def _find_quant_files(names: List[str]) -> List[str]:
+    """Tous les quantitatifs d'un DCE multi-lots (mêmes critères que _find_quant_file)."""
+    quant = [n for n in names if n.lower().endswith((".csv", ".xlsx"))]
+    keyed = [n for n in quant if KEYWORDS_QUANT.search(n.lower())]
+    return keyed or quant
+
+async def _dce_lot_request(name: str, path: str, base: dict) -> Tuple[FicheRequest, List[Ligne]]:
+    lignes = await _offload_waiting(_read_quant_path, name, path)
+    if not lignes:
+        raise HTTPException(status_code=400, detail="Quantitatif non exploitable (désignation/quantité manquantes ?).")
+    return FicheRequest(lot=_lot_from_member(name), **base), lignes
+
+async def _ready(req: FicheRequest) -> Tuple[FicheRequest, None]:
+    return req, None
+
+def _zip_stream_response(jobs: List[Tuple[str, Callable[[], Awaitable[Tuple[FicheRequest, Optional[List[Ligne]]]]]]], filename: str,
+                         spool: Optional[tempfile.TemporaryDirectory] = None) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_fiches_zip(jobs, spool),
+        media_type="application/zip",
+        headers={"Content-Disposition": _content_disposition(filename)}
+    )
+
+# ---------- Jobs d'analyse DCE ----------
+def _extract_upload(file: UploadFile, dest: str) -> None:
+    try:
+        extract_selected(file.file, dest, keep=lambda n: n.lower().endswith(EXTRACTABLE), max_member_bytes=MAX_MEMBER_BYTES)
+    except MemberTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"'{os.path.basename(str(e))}' trop volumineux une fois décompressé.")
+
+def _get_job(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job inconnu.")
+    return job
+
+# ---------- Métriques ----------
+# compteurs tenus par le cache et les pools, lus au moment du scrape
+Counter("marchia_result_cache_hits_total", "Résultats servis depuis le cache", fn=lambda: RESULT_CACHE.hits)
+Counter("marchia_result_cache_misses_total", "Résultats absents du cache", fn=lambda: RESULT_CACHE.misses)
+Gauge("marchia_worker_pool_pending", "Jobs CPU en cours ou en file dans le pool borné", fn=lambda: WORKER_POOL.pending)
+Gauge("marchia_jobs_active", "Jobs d'analyse DCE en attente ou en cours", fn=lambda: JOBS.active)
+
 # ---------- Routes ----------
 @app.get("/")
 def root():
@@ -373,17 +1193,28 @@ def root():
 def health():
     return {"ok": True, "version": __VERSION__}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=REGISTRY.expose(), media_type=METRICS_CONTENT_TYPE)
+
 @app.post("/genere-fiche")
-def genere_fiche(req: FicheRequest, format: str = Query("docx", pattern="^(docx|json)$")):
+def genere_fiche(
+    req: FicheRequest,
+    format: str = Query("docx", pattern="^(docx|json|xlsx|csv|pdf)$"),
+    if_none_match: Optional[str] = Header(None),
+):
     if format == "json":
-        return {"status": "ok", "message": "Fiche reçue correctement", "data": req.model_dump()}
-    content = build_doc(req)
-    filename = f'fiche_{req.projet.replace(" ", "_")}.docx'
-    return Response(
-        content=content,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+        return _json_response(req)
+    key = _cache_key("fiche", format, req.model_dump(mode="json"))
+    not_modified = _not_modified(key, if_none_match)
+    if not_modified:
+        return not_modified
+    result = RESULT_CACHE.get(key)
+    if result is not None:
+        return _result_response(key, result)
+    if format != "docx":
+        return _export_response(key, req, format)
+    return _stream_docx(key, f'fiche_{req.projet.replace(" ", "_")}.docx', render_document(req))
 
 @app.post("/genere-fiche-zip")
 async def genere_fiche_zip(
@@ -392,44 +1223,32 @@ async def genere_fiche_zip(
     moa: Optional[str] = Form(None),
     lot: Optional[str] = Form(None),
     descriptif: Optional[str] = Form(None),
+    if_none_match: Optional[str] = Header(None),
 ):
-    data = await file.read()
-    try:
-        zf = zipfile.ZipFile(BytesIO(data))
-    except zipfile.BadZipFile:
-        raise HTTPException(status_code=400, detail="Fichier non valide: ZIP attendu.")
+    _check_upload_size(file)
+    digest = await run_in_threadpool(_hash_upload, file)
+    key = _cache_key("zip", digest, projet, moa, lot, descriptif)
+    not_modified = _not_modified(key, if_none_match)
+    if not_modified:
+        return not_modified
+    cached = RESULT_CACHE.get(key)
+    if cached is not None:
+        return _result_response(key, cached)
+    zf = _open_upload_zip(file)
     names = zf.namelist()
     qcsv_name = next((n for n in names if n.lower().endswith("quantitatif.csv")), None)
     if not qcsv_name:
         raise HTTPException(status_code=400, detail="quantitatif.csv introuvable dans le ZIP.")
-    meta_name = next((n for n in names if n.lower().endswith("meta.json")), None)
-    meta = {}
-    if meta_name:
-        try:
-            meta = json.loads(zf.read(meta_name).decode("utf-8-sig"))
-        except Exception:
-            meta = {}
+    meta = _read_meta(zf, names)
     _projet = (projet or meta.get("projet") or "").strip()
     _moa = (moa or meta.get("moa") or "").strip()
     _lot = (lot or meta.get("lot") or "").strip()
     _desc = (descriptif or meta.get("descriptif") or "").strip()
     if not (_projet and _moa and _lot):
         raise HTTPException(status_code=400, detail="Champs requis manquants (projet, moa, lot).")
-    try:
-        raw = zf.read(qcsv_name).decode("utf-8-sig")
-    except UnicodeDecodeError:
-        raw = zf.read(qcsv_name).decode("latin-1")
-    lignes = _read_csv_quant(raw)
-    if not lignes:
-        raise HTTPException(status_code=400, detail="Aucune ligne exploitable trouvée dans quantitatif.csv.")
-    req = FicheRequest(projet=_projet, moa=_moa, lot=_lot, descriptif=_desc, lignes=lignes)
-    content = build_doc(req)
-    filename = f'fiche_{_projet.replace(" ", "_")}.docx'
-    return Response(
-        content=content,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    req = FicheRequest(projet=_projet, moa=_moa, lot=_lot, descriptif=_desc)
+    rendered = await _render_quant_upload(req, zf, qcsv_name, "Aucune ligne exploitable trouvée dans quantitatif.csv.")
+    return _stream_docx(key, f'fiche_{_projet.replace(" ", "_")}.docx', rendered)
 
 @app.post("/genere-fiche-dce")
 async def genere_fiche_dce(
@@ -438,34 +1257,24 @@ async def genere_fiche_dce(
     moa: Optional[str] = Form(None),
     lot: Optional[str] = Form(None),
     descriptif: Optional[str] = Form(None),
+    if_none_match: Optional[str] = Header(None),
 ):
-    data = await file.read()
-    try:
-        zf = zipfile.ZipFile(BytesIO(data))
-    except zipfile.BadZipFile:
-        raise HTTPException(status_code=400, detail="Fichier non valide: ZIP attendu.")
+    _check_upload_size(file)
+    digest = await run_in_threadpool(_hash_upload, file)
+    key = _cache_key("dce", digest, file.filename, projet, moa, lot, descriptif)
+    not_modified = _not_modified(key, if_none_match)
+    if not_modified:
+        return not_modified
+    cached = RESULT_CACHE.get(key)
+    if cached is not None:
+        return _result_response(key, cached)
+    zf = _open_upload_zip(file)
     names = zf.namelist()
-    quant_name = _find_quant_file(names)
+    with stage("find_quant"):
+        quant_name = _find_quant_file(names)
     if not quant_name:
         raise HTTPException(status_code=400, detail="Aucun fichier quantitatif (.csv/.xlsx) détecté (cherché: quant, dpgf, bpu, dqe, bordereau, estimatif).")
-    lignes: List[LigneQuantitative] = []
-    if quant_name.lower().endswith(".csv"):
-        try:
-            raw = zf.read(quant_name).decode("utf-8-sig")
-        except UnicodeDecodeError:
-            raw = zf.read(quant_name).decode("latin-1")
-        lignes = _read_csv_quant(raw)
-    elif quant_name.lower().endswith(".xlsx"):
-        lignes = _try_read_xlsx_quant(zf.read(quant_name))
-    if not lignes:
-        raise HTTPException(status_code=400, detail=f"Quantitatif '{os.path.basename(quant_name)}' non exploitable (désignation/quantité manquantes ?).")
-    meta_name = next((n for n in names if n.lower().endswith("meta.json")), None)
-    meta = {}
-    if meta_name:
-        try:
-            meta = json.loads(zf.read(meta_name).decode("utf-8-sig"))
-        except Exception:
-            meta = {}
+    meta = _read_meta(zf, names)
     _projet = (projet or meta.get("projet") or "").strip()
     _moa = (moa or meta.get("moa") or "").strip()
     _lot = (lot or meta.get("lot") or "").strip()
@@ -476,11 +1285,97 @@ async def genere_fiche_dce(
         _lot = _lot or g_lot
     if not _moa:
         _moa = "MOA non précisée"
-    req = FicheRequest(projet=_projet, moa=_moa, lot=_lot, descriptif=_desc, lignes=lignes)
-    content = build_doc(req)
-    filename = f'fiche_{_projet.replace(" ", "_")}.docx'
-    return Response(
-        content=content,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
+    req = FicheRequest(projet=_projet, moa=_moa, lot=_lot, descriptif=_desc)
+    empty = f"Quantitatif '{os.path.basename(quant_name)}' non exploitable (désignation/quantité manquantes ?)."
+    rendered = await _render_quant_upload(req, zf, quant_name, empty)
+    return _stream_docx(key, f'fiche_{_projet.replace(" ", "_")}.docx', rendered)
+
+@app.post("/genere-fiches-batch")
+async def genere_fiches_batch(reqs: List[FicheRequest]):
+    if not reqs:
+        raise HTTPException(status_code=400, detail="Liste de fiches vide.")
+    if len(reqs) > BATCH_MAX_FICHES:
+        raise HTTPException(status_code=400, detail=f"Trop de fiches (max {BATCH_MAX_FICHES}).")
+    if WORKER_POOL.pending >= WORKER_POOL.capacity:
+        raise HTTPException(status_code=503, detail="Serveur occupé, réessayez dans quelques secondes.", headers={"Retry-After": str(RETRY_AFTER_S)})
+    jobs = [(f"{i}:{req.lot}", functools.partial(_ready, req)) for i, req in enumerate(reqs)]
+    return _zip_stream_response(jobs, f'fiches_{reqs[0].projet.replace(" ", "_")}.zip')
+
+@app.post("/genere-fiches-batch-dce")
+async def genere_fiches_batch_dce(
+    file: UploadFile = File(..., description="ZIP DCE multi-lots : une fiche par quantitatif (.csv/.xlsx)"),
+    projet: Optional[str] = Form(None),
+    moa: Optional[str] = Form(None),
+    descriptif: Optional[str] = Form(None),
+):
+    zf = _open_upload_zip(file)
+    names = zf.namelist()
+    quant_names = _find_quant_files(names)
+    if not quant_names:
+        raise HTTPException(status_code=400, detail="Aucun fichier quantitatif (.csv/.xlsx) détecté.")
+    if len(quant_names) > BATCH_MAX_FICHES:
+        raise HTTPException(status_code=400, detail=f"Trop de quantitatifs (max {BATCH_MAX_FICHES}).")
+    if WORKER_POOL.pending >= WORKER_POOL.capacity:
+        raise HTTPException(status_code=503, detail="Serveur occupé, réessayez dans quelques secondes.", headers={"Retry-After": str(RETRY_AFTER_S)})
+    meta = _read_meta(zf, names)
+    _projet = (projet or meta.get("projet") or "").strip()
+    _moa = (moa or meta.get("moa") or "").strip() or "MOA non précisée"
+    _desc = (descriptif or meta.get("descriptif") or "").strip()
+    if not _projet:
+        _projet, _ = _guess_meta_from_names(file.filename or "DCE.zip", names)
+    base = {"projet": _projet, "moa": _moa, "descriptif": _desc}
+    # l'upload est fermé dès le retour de la route : les quantitatifs (seuls membres utiles) sont copiés
+    # sur disque avant le flux, puis lus un à un par les jobs ; le flux supprime le répertoire en se terminant
+    spool = tempfile.TemporaryDirectory(prefix="marchia-lots-")
+    try:
+        paths = await run_in_threadpool(_spool_members, zf, quant_names, spool.name)
+    except BaseException:
+        spool.cleanup()
+        raise
+    jobs = [(n, functools.partial(_dce_lot_request, n, path, base)) for n, path in zip(quant_names, paths)]
+    return _zip_stream_response(jobs, f'fiches_{_projet.replace(" ", "_")}.zip', spool)
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: Optional[UploadFile] = File(None, description="ZIP DCE à analyser"),
+    url: Optional[str] = Form(None, description="ou URL du ZIP DCE"),
+    sha256: Optional[str] = Form(None, description="empreinte SHA-256 attendue du ZIP téléchargé"),
+):
+    if (file is None) == (not url):
+        raise HTTPException(status_code=400, detail="Fournir soit un fichier ZIP, soit une URL.")
+    if url:
+        try:
+            check_url(url)
+        except UrlNotAllowed as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    job_id = None
+    try:
+        JOBS.check_capacity()
+        if file is not None:
+            _open_upload_zip(file)
+            job_id, path = JOBS.new_job_dir()
+            await run_in_threadpool(_extract_upload, file, path)
+        job = JOBS.submit(job_id, url=url, sha256=sha256)
+    except BaseException as e:
+        if job_id is not None:
+            JOBS.discard(job_id)
+        if isinstance(e, JobsSaturated):
+            raise HTTPException(status_code=503, detail="Trop d'analyses en attente, réessayez plus tard.", headers={"Retry-After": str(RETRY_AFTER_S)})
+        raise
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return _get_job(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = _get_job(job_id)
+    if job.status == "error":
+        # échec de l'analyse (DCE illisible, téléchargement refusé...), pas du serveur : 200 avec le motif
+        return {"job_id": job.id, "status": "error", "error": job.error}
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Analyse non terminée (statut : {job.status}).")
+    return job.result
+
+STARTUP_SECONDS.set(time.perf_counter() - _IMPORT_T0, "import")
@@ -0,0 +1,168 @@
+"""/genere-fiches-batch(-dce) : ZIP de fiches au fil de l'eau, répertoire de lots supprimé même si le client part.
+
+    python -m unittest discover tests   (depuis la racine du dépôt : chemins du template)
+"""
+import asyncio
+import gc
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+import docx
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+from bench import synth
+
+PATH = "/genere-fiches-batch-dce"
+
+
+def _dce(lots: int, extra=()) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("meta.json", json.dumps({"projet": "Ecole", "moa": "Ville"}))
+        for i in range(lots):
+            zf.writestr(f"DPGF_lot{i + 1}.csv", synth.quant_csv(30, seed=i))
+        for name, data in extra:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def _members(content: bytes):
+    with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        return zf.namelist(), json.loads(zf.read("rapport.json"))
+
+
+async def _drive(body: bytes, fail_on_chunk: int) -> list:
+    """Appelle l'application en ASGI ; le client coupe (envoi en erreur) au `fail_on_chunk`-ième morceau."""
+    req = httpx.Request("POST", f"http://test{PATH}", files={"file": ("dce.zip", body, "application/zip")})
+    payload = req.read()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": PATH, "raw_path": PATH.encode(), "query_string": b"",
+        "root_path": "", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(k.encode(), v.encode()) for k, v in req.headers.items()],
+    }
+    received, chunks = False, []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append(message["body"])
+            if len(chunks) >= fail_on_chunk:
+                raise OSError("connexion fermée par le client")
+
+    try:
+        await main.app(scope, receive, send)
+    except Exception:
+        pass
+    return chunks
+
+
+class BatchDceTest(unittest.TestCase):
+    def setUp(self):
+        # répertoire temporaire propre au test : les lots y sont copiés, on vérifie qu'il se vide
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        patcher = mock.patch.object(tempfile, "tempdir", self.tmp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _spools(self):
+        return [n for n in os.listdir(self.tmp) if n.startswith("marchia-lots-")]
+
+    def test_zip_of_fiches_and_report(self):
+        with TestClient(main.app) as client:
+            r = client.post(PATH, files={"file": ("dce.zip", _dce(3), "application/zip")})
+        self.assertEqual(r.status_code, 200, r.text)
+        with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+            self.assertIsNone(zf.testzip())
+            fiches = sorted(n for n in zf.namelist() if n.endswith(".docx"))
+            report = json.loads(zf.read("rapport.json"))
+            self.assertEqual(len(fiches), 3)
+            self.assertEqual(sorted(e["source"] for e in report), [f"DPGF_lot{i}.csv" for i in (1, 2, 3)])
+            self.assertFalse([e for e in report if "erreur" in e])
+            docx.Document(io.BytesIO(zf.read(fiches[0])))
+        self.assertEqual(self._spools(), [])
+
+    def test_unusable_lot_is_reported(self):
+        with TestClient(main.app) as client:
+            r = client.post(PATH, files={"file": ("dce.zip", _dce(1, [("DPGF_lot9.csv", "a;b\r\n")]), "application/zip")})
+        self.assertEqual(r.status_code, 200)
+        names, report = _members(r.content)
+        self.assertEqual(len([n for n in names if n.endswith(".docx")]), 1)
+        self.assertEqual([e["source"] for e in report if "erreur" in e], ["DPGF_lot9.csv"])
+        self.assertEqual(self._spools(), [])
+
+    def test_no_quantitatif_is_rejected(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            zf.writestr("RC.txt", "reglement")
+        with TestClient(main.app) as client:
+            r = client.post(PATH, files={"file": ("dce.zip", buf.getvalue(), "application/zip")})
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(self._spools(), [])
+
+    def test_too_many_lots_is_rejected(self):
+        with mock.patch.object(main, "BATCH_MAX_FICHES", 2), TestClient(main.app) as client:
+            r = client.post(PATH, files={"file": ("dce.zip", _dce(3), "application/zip")})
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(self._spools(), [])
+
+    def test_spool_removed_when_client_disconnects(self):
+        async def run():
+            chunks = await _drive(_dce(3), fail_on_chunk=1)
+            self.assertEqual(len(chunks), 1)
+            # le générateur interrompu est fermé par la boucle quand il est libéré
+            for _ in range(5):
+                gc.collect()
+                await asyncio.sleep(0.05)
+            return self._spools()
+
+        with TestClient(main.app):
+            self.assertEqual(asyncio.run(run()), [])
+
+    def test_spool_removed_when_stream_never_starts(self):
+        spool = tempfile.TemporaryDirectory(prefix="marchia-lots-")
+        self.assertEqual(len(self._spools()), 1)
+        gen = main._stream_fiches_zip([], spool)
+        del gen, spool
+        gc.collect()
+        self.assertEqual(self._spools(), [])
+
+
+class BatchJsonTest(unittest.TestCase):
+    def _req(self, lot, **kw):
+        return {"projet": "École", "moa": "Ville", "lot": lot, "descriptif": "",
+                "lignes": [{"rep": "F1", "dim": "120x100", "typo": "OF2", "perf": "Uw 1,3", "qte": 2, "pose": "tableau"}], **kw}
+
+    def test_same_names_are_numbered(self):
+        with TestClient(main.app) as client:
+            r = client.post("/genere-fiches-batch", json=[self._req("Menuiseries"), self._req("Menuiseries"), self._req("Serrurerie")])
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("filename*=UTF-8''fiches_%C3%89cole.zip", r.headers["content-disposition"])
+        names, report = _members(r.content)
+        self.assertEqual(sorted(n for n in names if n.endswith(".docx")),
+                         ["fiche_École_Menuiseries.docx", "fiche_École_Menuiseries_2.docx", "fiche_École_Serrurerie.docx"])
+        self.assertEqual(sorted(e["source"] for e in report), ["0:Menuiseries", "1:Menuiseries", "2:Serrurerie"])
+
+    def test_empty_or_too_many_is_rejected(self):
+        with mock.patch.object(main, "BATCH_MAX_FICHES", 1), TestClient(main.app) as client:
+            self.assertEqual(client.post("/genere-fiches-batch", json=[]).status_code, 400)
+            self.assertEqual(client.post("/genere-fiches-batch", json=[self._req("A"), self._req("B")]).status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
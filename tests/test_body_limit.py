@@ -0,0 +1,80 @@
+"""utils.body_limit : 413 sur Content-Length annoncé ou dès que le corps reçu dépasse la limite.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import unittest
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils.body_limit import BodyLimitMiddleware
+
+LIMIT = 1024 * 1024
+
+
+def _app(max_bytes=LIMIT):
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        app.state.calls += 1
+        return {"size": len(await request.body())}
+
+    if max_bytes is not None:
+        app.add_middleware(BodyLimitMiddleware, max_bytes=max_bytes)
+    return app
+
+
+class BodyLimitTest(unittest.TestCase):
+    def setUp(self):
+        self.app = _app()
+        self.client = TestClient(self.app)
+
+    def test_body_at_limit_passes(self):
+        r = self.client.post("/upload", content=b"x" * LIMIT)
+        self.assertEqual((r.status_code, r.json()), (200, {"size": LIMIT}))
+
+    def test_content_length_over_limit_rejected_before_the_route(self):
+        r = self.client.post("/upload", content=b"x" * (LIMIT + 1))
+        self.assertEqual(r.status_code, 413)
+        self.assertEqual(r.headers["connection"], "close")
+        self.assertEqual(r.json(), {"detail": "Fichier trop volumineux (max 1 Mo)."})
+        self.assertEqual(self.app.state.calls, 0)
+
+    def test_chunked_body_over_limit(self):
+        def chunks():
+            for _ in range(3):
+                yield b"x" * (LIMIT // 2)
+
+        r = self.client.post("/upload", content=chunks())
+        self.assertEqual(r.status_code, 413)
+        self.assertEqual(r.json()["detail"], "Fichier trop volumineux (max 1 Mo).")
+
+    def test_reading_stops_at_limit_despite_small_content_length(self):
+        # en-tête mensonger : le corps est lu morceau par morceau et coupé dès le dépassement
+        pulled, sent = [], []
+        messages = [{"type": "http.request", "body": b"x" * (LIMIT // 2), "more_body": True} for _ in range(10)]
+
+        async def receive():
+            pulled.append(1)
+            return messages[len(pulled) - 1]
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+                 "scheme": "http", "path": "/upload", "raw_path": b"/upload", "query_string": b"", "root_path": "",
+                 "headers": [(b"content-length", b"10")], "client": ("test", 1), "server": ("test", 80)}
+        asyncio.run(BodyLimitMiddleware(_app(None), max_bytes=LIMIT)(scope, receive, send))
+        self.assertEqual(len(pulled), 3)
+        self.assertEqual(sent[0]["status"], 413)
+
+    def test_disabled_limit(self):
+        r = TestClient(_app(0)).post("/upload", content=b"x" * (LIMIT + 1))
+        self.assertEqual(r.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""DOCX écrit au fil de l'eau (utils.docx_stream) et mise en cache bornée des réponses en flux (_stream_result).
+
+    python -m unittest discover tests   (depuis la racine du dépôt : chemins du template)
+"""
+import asyncio
+import io
+import unittest
+import zipfile
+from unittest import mock
+
+import docx
+
+import main
+from utils import docx_stream
+from utils.docx_stream import DocxSkeleton, document_xml
+from utils.result_cache import ResultCache
+
+
+def _consume(response) -> bytes:
+    async def read():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(read())
+
+
+def _package(doc, extra=()) -> bytes:
+    buf = io.BytesIO()
+    doc.save(buf)
+    if not extra:
+        return buf.getvalue()
+    with zipfile.ZipFile(buf, "a", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in extra:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+class SkeletonTest(unittest.TestCase):
+    def setUp(self):
+        self.doc = docx.Document()
+        self.doc.add_paragraph("Fiche École")
+        self.blob = _package(self.doc, [("customXml/pièce.xml", b"<a>\xc3\xa9</a>")])
+
+    def _write(self, xml: bytes) -> bytes:
+        return b"".join(DocxSkeleton(self.blob).stream(xml))
+
+    def test_output_is_a_valid_docx(self):
+        self.doc.add_paragraph("ajouté après le squelette")
+        xml = document_xml(self.doc)
+        out = self._write(xml)
+        with zipfile.ZipFile(io.BytesIO(out)) as zf, zipfile.ZipFile(io.BytesIO(self.blob)) as src:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist(), src.namelist())
+            self.assertEqual(zf.read(docx_stream.DOCUMENT_PART), xml)
+            # les autres parties sont recopiées telles quelles, nom UTF-8 compris
+            for name in src.namelist():
+                if name != docx_stream.DOCUMENT_PART:
+                    self.assertEqual(zf.read(name), src.read(name), name)
+            self.assertTrue(zf.getinfo("customXml/pièce.xml").flag_bits & 0x800)
+        self.assertEqual([p.text for p in docx.Document(io.BytesIO(out)).paragraphs], ["Fiche École", "ajouté après le squelette"])
+
+    def test_large_document_is_written_in_chunks(self):
+        for i in range(3000):
+            self.doc.add_paragraph(f"Article {i} : menuiseries extérieures, Uw ≤ 1,3 W/m².K")
+        xml = document_xml(self.doc)
+        # CRC et tailles cumulés sur plusieurs blocs, écrits dans le descripteur de données
+        with mock.patch.object(docx_stream, "CHUNK_SIZE", 16 * 1024):
+            self.assertGreater(len(xml), 10 * docx_stream.CHUNK_SIZE)
+            out = self._write(xml)
+        with zipfile.ZipFile(io.BytesIO(out)) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.getinfo(docx_stream.DOCUMENT_PART).file_size, len(xml))
+        self.assertEqual(len(docx.Document(io.BytesIO(out)).paragraphs), 3001)
+
+    def test_package_without_document_is_rejected(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            zf.writestr("[Content_Types].xml", "<Types/>")
+        with self.assertRaises(ValueError):
+            DocxSkeleton(buf.getvalue())
+
+    def test_fiche_response_opens_with_python_docx(self):
+        from fastapi.testclient import TestClient
+        req = {"projet": "École", "moa": "Ville", "lot": "Menuiseries", "descriptif": "",
+               "lignes": [{"rep": f"F{i}", "dim": "120x100", "typo": "OF2", "perf": "Uw 1,3", "qte": i, "pose": "tableau"} for i in range(1, 4)]}
+        with mock.patch.object(main, "RESULT_CACHE", ResultCache(max_bytes=0)):
+            r = TestClient(main.app).post("/genere-fiche", json=req)
+        self.assertEqual(r.status_code, 200)
+        d = docx.Document(io.BytesIO(r.content))
+        cells = {c.text for t in d.tables for row in t.rows for c in row.cells}
+        self.assertTrue({"F1", "F2", "F3"} <= cells)
+
+
+class StreamResultTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResultCache(max_bytes=1000)
+        patcher = mock.patch.object(main, "RESULT_CACHE", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _stream(self, key, chunks):
+        return _consume(main._stream_result(key, "application/octet-stream", "r.bin", iter(chunks)))
+
+    def test_small_result_is_cached(self):
+        body = self._stream("k", [b"a" * 400, b"b" * 400])
+        self.assertEqual(body, b"a" * 400 + b"b" * 400)
+        self.assertEqual(self.cache.get("k").content, body)
+
+    def test_result_over_limit_is_streamed_not_cached(self):
+        chunks = [bytes([65 + i]) * 400 for i in range(5)]
+        with mock.patch.object(self.cache, "put", wraps=self.cache.put) as put:
+            self.assertEqual(self._stream("k", chunks), b"".join(chunks))
+        # les morceaux ne sont plus gardés : rien n'est assemblé ni proposé au cache
+        put.assert_not_called()
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_disk_level_raises_the_limit(self):
+        cache = ResultCache(max_bytes=1000, disk_dir=None, disk_max_bytes=5000)
+        self.assertEqual(cache.entry_limit, 1000)
+        cache.disk_dir = "unused"
+        self.assertEqual(cache.entry_limit, 5000)
+
+    def test_interrupted_stream_is_not_cached(self):
+        def chunks():
+            yield b"a" * 10
+            raise RuntimeError("rendu interrompu")
+        with self.assertRaises(RuntimeError):
+            self._stream("k", chunks())
+        self.assertIsNone(self.cache.get("k"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""utils.docx_template : placeholders indexés en un parcours, substitués au niveau des runs, lignes répétables.
+
+    python -m unittest discover tests   (depuis la racine du dépôt : chemins du template)
+"""
+import io
+import unittest
+
+import docx
+
+import main
+from utils.docx_template import index_template, marker_paragraph, render
+
+
+def _doc(*paragraphs):
+    """Document dont chaque paragraphe est une liste de runs (texte, gras)."""
+    d = docx.Document()
+    for runs in paragraphs:
+        p = d.add_paragraph()
+        for text, bold in runs:
+            p.add_run(text).bold = bold
+    return d
+
+
+def _render(d, values):
+    body = d.element.body
+    render(body, index_template(body), values)
+    return d
+
+
+class PlaceholderTest(unittest.TestCase):
+    def test_both_syntaxes_and_unknown_names_kept(self):
+        d = _render(_doc([("Projet : {{ projet }} / [[LOT]] / {{inconnu}}", False)]), {"projet": "École", "LOT": "Menuiseries"})
+        self.assertEqual(d.paragraphs[0].text, "Projet : École / Menuiseries / {{inconnu}}")
+
+    def test_marker_split_across_runs_keeps_formatting(self):
+        d = _render(_doc([("MOA : ", False), ("{{", True), ("mo", True), ("a}} fin", False)]), {"moa": "Ville"})
+        p = d.paragraphs[0]
+        self.assertEqual(p.text, "MOA : Ville fin")
+        # la valeur est écrite dans le premier run du marqueur, qui garde son gras
+        self.assertEqual([(r.text, bool(r.bold)) for r in p.runs], [("MOA : ", False), ("Ville", True), ("", True), (" fin", False)])
+
+    def test_several_markers_in_one_run(self):
+        d = _render(_doc([("{{a}}-{{b}}-{{a}}", False)]), {"a": "un long texte", "b": None})
+        self.assertEqual(d.paragraphs[0].text, "un long texte--un long texte")
+
+    def test_multiline_value_becomes_line_breaks(self):
+        d = _render(_doc([("Descriptif : {{desc}}.", False)]), {"desc": "ligne 1\nligne 2"})
+        p = d.paragraphs[0]
+        self.assertEqual(p.text, "Descriptif : ligne 1\nligne 2.")
+        self.assertEqual(len(p._p.findall(".//" + docx.oxml.ns.qn("w:br"))), 1)
+
+    def test_marker_paragraph(self):
+        d = _doc([("Titre", False)], [("{{descriptif}}", False)])
+        body = d.element.body
+        p = marker_paragraph(body, index_template(body), "descriptif")
+        self.assertIs(p, d.paragraphs[1]._p)
+        self.assertIsNone(marker_paragraph(body, index_template(body), "absent"))
+
+
+class RowBlockTest(unittest.TestCase):
+    def _table_doc(self):
+        d = docx.Document()
+        d.add_paragraph("{{projet}}")
+        t = d.add_table(rows=2, cols=2)
+        t.cell(0, 0).text, t.cell(0, 1).text = "Repère", "Qté"
+        t.cell(1, 0).text, t.cell(1, 1).text = "{{ligne.rep}} ({{projet}})", "[[ligne.qte]]"
+        return d
+
+    def test_index_finds_row_block(self):
+        body = self._table_doc().element.body
+        idx = index_template(body)
+        self.assertEqual(idx.names(), {"projet", "ligne"})
+        self.assertEqual(sorted(m.name for m in idx.row("ligne").markers), ["ligne.qte", "ligne.rep", "projet"])
+
+    def test_row_repeated_per_item(self):
+        d = _render(self._table_doc(), {"projet": "P", "ligne": [{"rep": "F1", "qte": 2}, {"rep": "F2", "qte": 3}]})
+        rows = [[c.text for c in r.cells] for r in d.tables[0].rows]
+        self.assertEqual(rows, [["Repère", "Qté"], ["F1 (P)", "2"], ["F2 (P)", "3"]])
+        self.assertEqual(d.paragraphs[0].text, "P")
+
+    def test_empty_list_removes_row_missing_keeps_it(self):
+        d = _render(self._table_doc(), {"ligne": []})
+        self.assertEqual(len(d.tables[0].rows), 1)
+        d = _render(self._table_doc(), {"projet": "P"})
+        self.assertEqual(d.tables[0].cell(1, 0).text, "{{ligne.rep}} ({{projet}})")
+
+
+class DefaultTemplateTest(unittest.TestCase):
+    def test_fiche_has_no_placeholder_left(self):
+        lignes = [main.LigneQuantitative(rep="F1", dim="120x100", typo="OF2", perf="Uw 1,3", qte=4, pose="tableau")]
+        req = main.FicheRequest(projet="École", moa="Ville", lot="Menuiseries", descriptif="Remplacement\ndes fenêtres", lignes=lignes)
+        d = docx.Document(io.BytesIO(main.build_doc(req)))
+        text = "".join(t.text or "" for t in d.element.body.iter(docx.oxml.ns.qn("w:t")))
+        self.assertIn("Remplacementdes fenêtres", text)
+        self.assertIn("Uw 1,3", text)
+        self.assertNotRegex(text, r"\{\{|\[\[")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,229 @@
+"""utils.download contre un serveur HTTP local (http.server) : reprise, 5xx, plafond, SHA-256, redirections.
+
+    python -m unittest discover tests
+"""
+import hashlib
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from utils.download import DownloadError, TransientHTTPError, UrlNotAllowed, check_url, download
+
+DATA = os.urandom(300 * 1024)
+ETAG = '"v1"'
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        srv = self.server
+        with srv.lock:
+            srv.requests.append((self.path, self.headers.get("Range"), self.headers.get("If-Range")))
+            srv.active += 1
+            srv.max_active = max(srv.max_active, srv.active)
+            status = srv.statuses.pop(0) if srv.statuses else None
+        try:
+            self._respond(srv, status)
+        finally:
+            with srv.lock:
+                srv.active -= 1
+
+    def _respond(self, srv, status):
+        if status is not None:
+            self.send_response(status)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/redirect":
+            self._redirect("/data")
+        elif self.path == "/evil":
+            self._redirect("http://169.254.169.254/latest/meta-data")
+        elif self.path in ("/data", "/chunked"):
+            self._data(srv)
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def _redirect(self, location):
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _data(self, srv):
+        start = 0
+        rng = self.headers.get("Range")
+        if rng and self.headers.get("If-Range") == ETAG:
+            start = int(rng.split("=")[1].rstrip("-"))
+        body = DATA[start:]
+        self.send_response(206 if start else 200)
+        self.send_header("ETag", ETAG)
+        if self.path == "/chunked":
+            # pas de Content-Length : seul le cumul reçu permet d'appliquer le plafond
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(body)
+            self.close_connection = True
+            return
+        self.send_header("Content-Length", str(len(body)))
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(DATA) - 1}/{len(DATA)}")
+        self.end_headers()
+        with srv.lock:
+            drop = srv.drops > 0
+            srv.drops -= drop
+        if drop:
+            # coupure au tiers du corps annoncé
+            self.wfile.write(body[:len(body) // 3])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        if srv.slow:
+            srv.slow.wait(0.2)
+        self.wfile.write(body)
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.statuses = []
+        self.drops = 0
+        self.active = self.max_active = 0
+        self.slow = None
+
+    def handle_error(self, request, client_address):
+        # client qui abandonne en cours de corps (plafond dépassé) : attendu
+        pass
+
+
+class DownloadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.srv = _Server()
+        cls.base = f"http://127.0.0.1:{cls.srv.server_port}"
+        threading.Thread(target=cls.srv.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.srv.shutdown()
+        cls.srv.server_close()
+
+    def setUp(self):
+        srv = self.srv
+        srv.requests, srv.statuses, srv.drops, srv.max_active, srv.slow = [], [], 0, 0, None
+        self.dir = tempfile.mkdtemp()
+        self.dest = os.path.join(self.dir, "dce.zip")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def _policy(self, url):
+        if not url.startswith(self.base + "/"):
+            raise UrlNotAllowed(url)
+
+    def _download(self, path="/data", **kw):
+        kw.setdefault("policy", self._policy)
+        kw.setdefault("retries", 2)
+        kw.setdefault("timeout", 5)
+        return download(self.base + path, self.dest, **kw)
+
+    def _content(self):
+        with open(self.dest, "rb") as f:
+            return f.read()
+
+    def test_download_and_digest(self):
+        digest = self._download(sha256=hashlib.sha256(DATA).hexdigest().upper())
+        self.assertEqual(digest, hashlib.sha256(DATA).hexdigest())
+        self.assertEqual(self._content(), DATA)
+        self.assertEqual(os.listdir(self.dir), ["dce.zip"])
+
+    def test_resume_after_dropped_connection(self):
+        self.srv.drops = 1
+        self._download()
+        self.assertEqual(self._content(), DATA)
+        (_, r1, _), (_, r2, if_range) = self.srv.requests
+        self.assertIsNone(r1)
+        # reprise au dernier bloc lu avant la coupure
+        self.assertTrue(0 < int(r2[len("bytes="):-1]) <= len(DATA) // 3, r2)
+        self.assertEqual(if_range, ETAG)
+
+    def test_transient_status_is_retried(self):
+        self.srv.statuses = [503, 502]
+        self._download()
+        self.assertEqual(self._content(), DATA)
+        self.assertEqual(len(self.srv.requests), 3)
+
+    def test_transient_status_gives_up(self):
+        self.srv.statuses = [503] * 3
+        with self.assertRaises(TransientHTTPError):
+            self._download(retries=1)
+        self.assertEqual(len(self.srv.requests), 2)
+
+    def test_client_error_is_not_retried(self):
+        with self.assertRaises(DownloadError):
+            self._download("/missing")
+        self.assertEqual(len(self.srv.requests), 1)
+
+    def test_size_cap(self):
+        for path in ("/data", "/chunked"):
+            with self.subTest(path=path), self.assertRaises(DownloadError):
+                self._download(path, max_bytes=len(DATA) - 1)
+            self.assertFalse(os.path.exists(self.dest))
+
+    def test_sha256_mismatch_discards_partial(self):
+        with self.assertRaises(DownloadError):
+            self._download(sha256="0" * 64)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_redirects_are_checked(self):
+        self._download("/redirect")
+        self.assertEqual(self._content(), DATA)
+        with self.assertRaises(UrlNotAllowed):
+            self._download("/evil")
+        self.assertEqual([p for p, _, _ in self.srv.requests], ["/redirect", "/data", "/evil"])
+
+    def test_default_policy(self):
+        with self.assertRaises(UrlNotAllowed):
+            download(self.base + "/data", self.dest, policy=check_url)
+        self.assertEqual(self.srv.requests, [])
+        for url in ("https://127.0.0.1/x", "https://user@dce.exemple.fr/x", "https://dce.exemple.fr.evil/x"):
+            with self.subTest(url=url), self.assertRaises(UrlNotAllowed):
+                check_url(url, hosts=("dce.exemple.fr", ".marches.exemple.fr"))
+        check_url("https://dce.exemple.fr/x", hosts=("dce.exemple.fr",))
+        check_url("https://a.marches.exemple.fr/x", hosts=(".marches.exemple.fr",))
+
+    def test_same_destination_is_serialized(self):
+        self.srv.slow = threading.Event()
+        errors = []
+
+        def job():
+            try:
+                self._download()
+            except Exception as e:  # remonté au fil principal
+                errors.append(e)
+
+        threads = [threading.Thread(target=job) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(30)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.srv.max_active, 1)
+        self.assertEqual(self._content(), DATA)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+"""/jobs : cycle de vie d'une analyse DCE (202, statut, 409, résultat), échec en 200, saturation, nettoyage.
+
+    python -m unittest discover tests   (depuis la racine du dépôt : chemins du template)
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import main
+from agents import a1_extract
+from agents.orchestrator import JobManager
+from bench import synth
+from utils.download import DownloadError, partial_files
+
+URL = "https://dce.example.org/dce.zip"
+
+
+class JobsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.jobs = JobManager(upload_dir=self.dir, max_pending=1, analysis_mode="thread")
+        for patcher in (mock.patch.object(main, "JOBS", self.jobs), mock.patch.object(main, "check_url", lambda url: None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def _post(self, **kw):
+        if "url" in kw:
+            return self.client.post("/jobs", data=kw)
+        return self.client.post("/jobs", files={"file": ("dce.zip", synth.dce_zip(20, pdf_pages=3), "application/zip")})
+
+    def _wait(self, job_id, timeout=120):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = self.client.get(f"/jobs/{job_id}").json()
+            if status["status"] in ("done", "error"):
+                return status
+            time.sleep(0.05)
+        self.fail(f"job {job_id} non terminé")
+
+    def _hold_jobs(self):
+        """Aucun job ne démarre tant que le sémaphore (créé sur la boucle du client) n'est pas relâché."""
+        self.client.portal.call(lambda: setattr(self.jobs, "_slots", asyncio.Semaphore(0)))
+        return lambda: self.client.portal.call(self.jobs._slots.release)
+
+    def test_lifecycle(self):
+        release = self._hold_jobs()
+        r = self._post()
+        self.assertEqual(r.status_code, 202)
+        job_id = r.json()["job_id"]
+        self.assertEqual(self.client.get(f"/jobs/{job_id}").json()["status"], "pending")
+        self.assertEqual(self.client.get(f"/jobs/{job_id}/result").status_code, 409)
+        release()
+        status = self._wait(job_id)
+        self.assertEqual(status["status"], "done", status)
+        r = self.client.get(f"/jobs/{job_id}/result")
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("resultats", r.json())
+
+    def test_unknown_job_is_404(self):
+        self.assertEqual(self.client.get("/jobs/inconnu").status_code, 404)
+        self.assertEqual(self.client.get("/jobs/inconnu/result").status_code, 404)
+
+    def test_file_xor_url(self):
+        self.assertEqual(self.client.post("/jobs").status_code, 400)
+        r = self.client.post("/jobs", data={"url": URL}, files={"file": ("dce.zip", b"PK", "application/zip")})
+        self.assertEqual(r.status_code, 400)
+
+    def test_saturation_is_503_and_leaves_no_files(self):
+        self._hold_jobs()
+        self.assertEqual(self._post().status_code, 202)
+        before = sorted(os.listdir(self.dir))
+        r = self._post()
+        self.assertEqual(r.status_code, 503)
+        self.assertIn("retry-after", r.headers)
+        self.assertEqual(sorted(os.listdir(self.dir)), before)
+
+    def test_failed_download_is_an_error_result_and_cleans_partial(self):
+        def failing_download(url, dest, sha256=None):
+            for path in partial_files(dest):
+                with open(path, "wb") as f:
+                    f.write(b"debut")
+            raise DownloadError("502 après 3 tentatives")
+
+        with mock.patch.object(a1_extract, "download", failing_download):
+            r = self._post(url=URL)
+            self.assertEqual(r.status_code, 202)
+            job_id = r.json()["job_id"]
+            status = self._wait(job_id)
+        self.assertEqual(status["status"], "error")
+        self.assertEqual(status["stages"]["download"]["status"], "error")
+        self.assertEqual(status["stages"]["extract"]["status"], "skipped")
+        r = self.client.get(f"/jobs/{job_id}/result")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {"job_id": job_id, "status": "error", "error": "DownloadError: 502 après 3 tentatives"})
+        self.assertEqual([n for n in os.listdir(self.dir) if n.startswith("dl-")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+"""utils.metrics : étapes et lignes lues dans un processus de travail rejouées dans le parent ; profil écrit hors boucle.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from utils import metrics
+from utils.metrics import REGISTRY, MetricsMiddleware, count_rows, stage
+from utils.profiler import SamplingProfiler
+from utils.worker_pool import BoundedPool
+
+
+def _parse_in_child(n):
+    with stage("test_parse"):
+        count_rows(n, "test")
+    return os.getpid()
+
+
+def _sample(name: str) -> float:
+    line = next((l for l in REGISTRY.expose().decode().splitlines() if l.startswith(name + " ")), None)
+    return float(line.split()[-1]) if line else 0.0
+
+
+class ProcessMetricsTest(unittest.TestCase):
+    def test_child_metrics_are_replayed_in_parent(self):
+        pool = BoundedPool(mode="process", workers=1)
+        self.addCleanup(lambda: pool._executor and pool._executor.shutdown())
+        rows0 = _sample('marchia_rows_parsed_total{format="test"}')
+        count0 = _sample('marchia_stage_seconds_count{stage="test_parse"}')
+
+        async def run():
+            timings = []
+            token = metrics._timings.set(timings)
+            try:
+                pid = await pool.run(_parse_in_child, 7)
+                pid = await pool.run(_parse_in_child, 5) or pid
+            finally:
+                metrics._timings.reset(token)
+            return pid, timings
+
+        pid, timings = asyncio.run(run())
+        self.assertNotEqual(pid, os.getpid())
+        self.assertEqual(_sample('marchia_rows_parsed_total{format="test"}') - rows0, 12)
+        self.assertEqual(_sample('marchia_stage_seconds_count{stage="test_parse"}') - count0, 2)
+        # et dans le Server-Timing de la requête en cours
+        self.assertEqual([name for name, _ in timings], ["test_parse", "test_parse"])
+
+
+class ProfilerWriteTest(unittest.TestCase):
+    def test_profile_written_off_the_event_loop(self):
+        out = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out, True)
+        profiler = SamplingProfiler(threshold_ms=0, out_dir=out)
+        writers = []
+        stop = profiler.stop
+
+        def stop_recorded(*args):
+            writers.append(threading.current_thread())
+            return stop(*args)
+
+        profiler.stop = stop_recorded
+
+        async def app(scope, receive, send):
+            await asyncio.sleep(0.05)
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        async def run():
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+
+            async def send(message):
+                pass
+
+            scope = {"type": "http", "method": "GET", "path": "/lent", "headers": []}
+            await MetricsMiddleware(app, profiler=profiler)(scope, receive, send)
+            return threading.current_thread()
+
+        loop_thread = asyncio.run(run())
+        self.assertEqual(len(writers), 1)
+        self.assertIsNot(writers[0], loop_thread)
+        self.assertEqual(len(os.listdir(out)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
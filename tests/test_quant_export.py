@@ -0,0 +1,69 @@
+"""Exports du quantitatif (csv, xlsx) : cellules-formules neutralisées, XLSX renvoyé entier.
+
+    python -m unittest discover tests   (depuis la racine du dépôt : chemins du template)
+"""
+import csv
+import io
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+
+import main
+from utils.quant_export import csv_chunks, xlsx_bytes
+from utils.result_cache import ResultCache
+
+HOSTILE = ["=HYPERLINK(\"http://x\")", "+1+2", "-2+3", "@SUM(A1)", "\tx", "a=b", "1,3", ""]
+
+
+class CsvTest(unittest.TestCase):
+    def _rows(self, rows):
+        text = b"".join(csv_chunks(["a"] * len(rows[0]), rows, batch=1)).decode("utf-8-sig")
+        return list(csv.reader(io.StringIO(text, newline=""), delimiter=";"))[1:]
+
+    def test_formula_cells_are_prefixed(self):
+        self.assertEqual(self._rows([HOSTILE, [4, 5, 6, 7, 8, 9, 10, 11]]), [
+            ["'=HYPERLINK(\"http://x\")", "'+1+2", "'-2+3", "'@SUM(A1)", "'\tx", "a=b", "1,3", ""],
+            ["4", "5", "6", "7", "8", "9", "10", "11"],
+        ])
+
+
+class XlsxTest(unittest.TestCase):
+    def test_formula_text_stays_text(self):
+        ws = load_workbook(io.BytesIO(xlsx_bytes("Lot", ["a"] * 8, [HOSTILE, [1, 2.5, None, "x", "y", "z", "w", "v"]]))).active
+        row = ws[2]
+        self.assertEqual([c.value for c in row], ["=HYPERLINK(\"http://x\")", "+1+2", "-2+3", "@SUM(A1)", "\tx", "a=b", "1,3", None])
+        self.assertEqual({c.data_type for c in row if c.value is not None}, {"s"})
+        self.assertEqual([c.value for c in ws[3]][:2], [1, 2.5])
+
+
+class ExportResponseTest(unittest.TestCase):
+    REQ = {"projet": "Ecole", "moa": "Ville", "lot": "Menuiseries", "descriptif": "",
+           "lignes": [{"rep": "=1+1", "dim": "120x100", "typo": "OF2", "perf": "Uw 1,3", "qte": 4, "pose": "tableau"}]}
+
+    def setUp(self):
+        self.cache = ResultCache(max_bytes=10 * 1024 * 1024)
+        patcher = mock.patch.object(main, "RESULT_CACHE", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def test_xlsx_is_a_full_cached_response(self):
+        r = self.client.post("/genere-fiche?format=xlsx", json=self.REQ)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(int(r.headers["content-length"]), len(r.content))
+        self.assertIn("export_xlsx", r.headers["server-timing"])
+        ws = load_workbook(io.BytesIO(r.content)).active
+        self.assertEqual((ws["A2"].value, ws["A2"].data_type, ws["E2"].value), ("=1+1", "s", 4))
+        again = self.client.post("/genere-fiche?format=xlsx", json=self.REQ)
+        self.assertEqual((again.content, self.cache.hits), (r.content, 1))
+
+    def test_csv_is_streamed_and_escaped(self):
+        r = self.client.post("/genere-fiche?format=csv", json=self.REQ)
+        self.assertNotIn("content-length", r.headers)
+        self.assertIn("'=1+1;", r.content.decode("utf-8-sig"))
+
+
+if __name__ == "__main__":
+    unittest.main()
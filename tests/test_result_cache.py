@@ -0,0 +1,125 @@
+"""utils.result_cache (LRU mémoire, niveau disque) et revalidation HTTP : ETag, If-None-Match, 304.
+
+    python -m unittest discover tests   (depuis la racine du dépôt : chemins du template)
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import main
+from utils.result_cache import CachedResult, ResultCache
+
+
+def _result(n: int, c: bytes = b"x") -> CachedResult:
+    return CachedResult("application/octet-stream", "r.bin", c * n)
+
+
+class MemoryLevelTest(unittest.TestCase):
+    def test_lru_eviction_by_size(self):
+        cache = ResultCache(max_bytes=300)
+        for k in "abc":
+            cache.put(k, _result(100, k.encode()))
+        cache.get("a")  # a devient le plus récent : b est évincé en premier
+        cache.put("d", _result(100))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual([k for k in "acd" if cache.get(k)], ["a", "c", "d"])
+
+    def test_oversized_entry_is_ignored(self):
+        cache = ResultCache(max_bytes=100)
+        cache.put("a", _result(50))
+        cache.put("big", _result(101))
+        self.assertIsNone(cache.get("big"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_replacing_a_key_keeps_size_exact(self):
+        cache = ResultCache(max_bytes=100)
+        cache.put("a", _result(80))
+        cache.put("a", _result(60))
+        cache.put("b", _result(40))
+        self.assertEqual((cache.get("a").content, cache.get("b").content), (b"x" * 60, b"x" * 40))
+
+    def test_hits_and_misses(self):
+        cache = ResultCache(max_bytes=100)
+        cache.get("a")
+        cache.put("a", _result(1))
+        cache.get("a")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+class DiskLevelTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_disk_survives_a_new_cache_and_is_promoted(self):
+        result = CachedResult("application/pdf", "fiche_École.pdf", b"%PDF" * 10)
+        ResultCache(max_bytes=1000, disk_dir=self.dir, disk_max_bytes=1000).put("k", result)
+        cache = ResultCache(max_bytes=1000, disk_dir=self.dir, disk_max_bytes=1000)
+        self.assertEqual(cache.get("k"), result)
+        os.remove(os.path.join(self.dir, "k.bin"))
+        self.assertEqual(cache.get("k"), result)  # servi par le niveau mémoire
+
+    def test_disk_pruned_by_last_access(self):
+        # chaque fichier : ~60 octets d'entête + 100 de contenu ; deux tiennent sous la limite
+        cache = ResultCache(max_bytes=0, disk_dir=self.dir, disk_max_bytes=400)
+        for i, k in enumerate("abc"):
+            cache.put(k, _result(100))
+            past = time.time() - 100 + i
+            os.utime(os.path.join(self.dir, f"{k}.bin"), (past, past))
+        self.assertEqual(sorted(os.listdir(self.dir)), ["b.bin", "c.bin"])
+
+    def test_corrupt_file_is_a_miss(self):
+        cache = ResultCache(max_bytes=1000, disk_dir=self.dir, disk_max_bytes=1000)
+        with open(os.path.join(self.dir, "k.bin"), "wb") as f:
+            f.write(b"pas du json\n...")
+        self.assertIsNone(cache.get("k"))
+
+
+class RevalidationTest(unittest.TestCase):
+    REQ = {"projet": "Ecole", "moa": "Ville", "lot": "Menuiseries", "descriptif": "",
+           "lignes": [{"rep": "F1", "dim": "120x100", "typo": "OF2", "perf": "Uw 1,3", "qte": 4, "pose": "tableau"}]}
+
+    def setUp(self):
+        self.cache = ResultCache(max_bytes=10 * 1024 * 1024)
+        patcher = mock.patch.object(main, "RESULT_CACHE", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = TestClient(main.app)
+
+    def _post(self, req=None, fmt="docx", **headers):
+        return self.client.post(f"/genere-fiche?format={fmt}", json=req or self.REQ, headers=headers)
+
+    def test_second_request_served_from_cache(self):
+        first = self._post()
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["etag"]
+        self.assertTrue(etag.startswith('W/"'))
+        second = self._post()
+        self.assertEqual((second.headers["etag"], second.content), (etag, first.content))
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_if_none_match_gives_304(self):
+        etag = self._post(fmt="csv").headers["etag"]
+        for value in (etag, etag.removeprefix("W/"), f'"autre", {etag}', "*"):
+            with self.subTest(if_none_match=value):
+                r = self._post(fmt="csv", **{"If-None-Match": value})
+                self.assertEqual(r.status_code, 304)
+                self.assertEqual((r.content, r.headers["etag"]), (b"", etag))
+
+    def test_other_input_or_format_changes_the_etag(self):
+        etag = self._post().headers["etag"]
+        other = dict(self.REQ, lot="Serrurerie")
+        self.assertNotEqual(self._post(other).headers["etag"], etag)
+        self.assertNotEqual(self._post(fmt="xlsx").headers["etag"], etag)
+        r = self._post(other, **{"If-None-Match": etag})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.content)
+
+
+if __name__ == "__main__":
+    unittest.main()
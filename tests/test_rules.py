@@ -0,0 +1,72 @@
+"""agents.rules : règles déclaratives appliquées au texte replié, captures restituées telles qu'écrites.
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import tempfile
+import unittest
+
+from agents import a2_cctp, a4_rc_ccap
+from agents.rules import apply_rules, load_rules
+
+
+def _docstore(*texts):
+    return {"pages": [("CCAP.pdf", i + 1, t) for i, t in enumerate(texts)]}
+
+
+class RulesTest(unittest.TestCase):
+    def _load(self, rules):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"$schema": "./rules.schema.json", **rules}, f, ensure_ascii=False)
+        return load_rules(path)
+
+    def test_captures_keep_case_and_accents(self):
+        rules = self._load({"rc_ccap": [
+            {"id": "delai", "terms": ["delai"], "prefix": True,
+             "pattern": r"delai d'execution : (?P<delai>[^.\n]+)",
+             "set": {"Delais": "{delai}", "Extrait": "{0}"}},
+        ]})
+        # « Œuvre » avant le match : le texte replié est plus long que l'original (œ -> oe)
+        docstore = _docstore("Sommaire", "Œuvre courante.\nDélai d'exécution : 12 SEMAINES à compter de l'OS.")
+        results = apply_rules("rc_ccap", docstore, {"Delais": "Non detecte"}, rules=rules)
+        self.assertEqual(results["Delais"], "12 SEMAINES à compter de l'OS")
+        self.assertEqual(results["Extrait"], "Délai d'exécution : 12 SEMAINES à compter de l'OS")
+
+    def test_append_and_dotted_paths(self):
+        rules = self._load({"cctp": [
+            {"id": "uw", "terms": ["uw"], "pattern": r"uw\s*[<=≤]+\s*(?P<uw>\d+[.,]\d+)",
+             "set": {"Performances.Uw": "Uw ≤ {uw}"}},
+            {"id": "menuiserie", "terms": ["menuiserie"], "prefix": True, "append": {"Matieres": "Aluminium"}},
+        ]})
+        docstore = _docstore("Menuiseries ALUMINIUM, UW ≤ 1,3 W/m².K")
+        results = apply_rules("cctp", docstore, {"Matieres": [], "Performances": {}}, rules=rules)
+        self.assertEqual(results, {"Matieres": ["Aluminium"], "Performances": {"Uw": "Uw ≤ 1,3"}})
+
+    def test_unmatched_rule_leaves_results(self):
+        rules = self._load({"rc_ccap": [{"terms": ["variante"], "pattern": r"variantes? (?P<v>autorisees?)", "set": {"Variantes": "{v}"}}]})
+        results = apply_rules("rc_ccap", _docstore("Les variantes sont interdites."), {"Variantes": "Non detecte"}, rules=rules)
+        self.assertEqual(results["Variantes"], "Non detecte")
+
+    def test_pattern_must_be_folded(self):
+        for pattern in ("Délai", "[A-Z]+", "uw (?P<v>Uw)"):
+            with self.subTest(pattern=pattern), self.assertRaises(ValueError):
+                self._load({"cctp": [{"pattern": pattern, "set": {"x": "{0}"}}]})
+        # échappements et noms de groupes ne sont pas du texte comparé
+        self._load({"cctp": [{"pattern": r"(?P<Uw>\d+\S*)\W", "set": {"x": "{Uw}"}}]})
+
+    def test_rule_needs_terms_or_pattern(self):
+        with self.assertRaises(ValueError):
+            self._load({"cctp": [{"id": "vide", "set": {"x": 1}}]})
+
+    def test_default_rules_match_folded_terms(self):
+        docstore = _docstore("Menuiseries PVC, Uw 1,3 - DTU 36.5", "PÉNALITÉS de retard ; Variante autorisée.")
+        self.assertEqual(a2_cctp.analyze(docstore)["Normes"], ["DTU 36.5"])
+        rc = a4_rc_ccap.analyze(docstore)
+        self.assertEqual((rc["Penalites"], rc["Variantes"]), ("Penalites prevues", "Mentionne"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+from fastapi import HTTPException
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Fichier trop volumineux (max {max_bytes // (1024 * 1024)} Mo).")
+
+
+class BodyLimitMiddleware:
+    """Middleware ASGI : refuse (413) un corps de requête au-delà de `max_bytes` avant de l'avoir reçu en entier.
+
+    Un Content-Length trop grand est refusé d'emblée, sans rien lire ; sinon (transfert
+    chunked, en-tête mensonger) la lecture s'interrompt dès que le cumul dépasse la limite.
+    L'upload n'est donc jamais spoolé sur disque ni haché au-delà de la limite.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(scope, receive, send)
+            return
+        received = 0
+
+        async def receive_capped():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # relevée telle quelle par FastAPI pendant la lecture du corps -> réponse 413
+                    raise _too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, receive_capped, send)
+
+    async def _reject(self, scope, receive, send):
+        from fastapi.responses import JSONResponse
+        exc = _too_large(self.max_bytes)
+        # Connection: close : le client n'a pas à envoyer le corps annoncé
+        response = JSONResponse({"detail": exc.detail}, status_code=413, headers={"Connection": "close"})
+        await response(scope, receive, send)
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    digest TEXT NOT NULL,
+    version TEXT NOT NULL,
+    n_pages INTEGER NOT NULL,
+    PRIMARY KEY (digest, version)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    digest TEXT NOT NULL,
+    version TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (digest, version, page)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tables (
+    digest TEXT NOT NULL,
+    version TEXT NOT NULL,
+    records BLOB NOT NULL,
+    PRIMARY KEY (digest, version)
+);
+"""
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class DocStore:
+    """Extractions DCE persistées dans SQLite, indexées par (empreinte du fichier, version d'extracteur).
+
+    Un fichier déjà vu (addendum, DCE révisé) n'est pas ré-extrait : seul son texte
+    par page et ses tableaux sont relus. Changer de version d'extracteur invalide
+    les entrées sans les écraser.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls, upload_dir: str = "uploads") -> "DocStore":
+        return cls(os.environ.get("DOCSTORE_PATH") or os.path.join(upload_dir, "docstore.sqlite"))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def known(self, digests: Iterable[str], version: str) -> Set[str]:
+        digests = list(set(digests))
+        if not digests:
+            return set()
+        marks = ",".join("?" * len(digests))
+        rows = self._connect().execute(
+            f"SELECT digest FROM files WHERE version = ? AND digest IN ({marks})", [version, *digests]
+        )
+        return {d for (d,) in rows}
+
+    def put(self, digest: str, version: str, pages: Sequence[Tuple[int, str]], records: Optional[list] = None) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pages WHERE digest = ? AND version = ?", (digest, version))
+            conn.executemany(
+                "INSERT INTO pages (digest, version, page, text) VALUES (?, ?, ?, ?)",
+                [(digest, version, page, text) for page, text in pages],
+            )
+            if records is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO tables (digest, version, records) VALUES (?, ?, ?)",
+                    (digest, version, pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)),
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO files (digest, version, n_pages) VALUES (?, ?, ?)",
+                (digest, version, len(pages)),
+            )
+
+    def iter_pages(self, digest: str, version: str) -> Iterator[Tuple[int, str]]:
+        yield from self._connect().execute(
+            "SELECT page, text FROM pages WHERE digest = ? AND version = ? ORDER BY page", (digest, version)
+        )
+
+    def records(self, digest: str, version: str) -> list:
+        row = self._connect().execute(
+            "SELECT records FROM tables WHERE digest = ? AND version = ?", (digest, version)
+        ).fetchone()
+        return pickle.loads(row[0]) if row else []
+
+
+class DocstoreView(Mapping):
+    """Vue paresseuse d'un DCE sur le DocStore, compatible avec le dict historique.
+
+    Les clés "doc_text", "tables" et "pages" ne sont matérialisées qu'au premier accès ;
+    `iter_pages()` parcourt le texte page par page sans le charger en entier. La clé
+    "index" (TextIndex partagé par les agents) est accessible mais hors itération.
+    """
+
+    _KEYS = ("files", "doc_text", "tables", "pages")
+    _LAZY = _KEYS + ("index",)
+
+    def __init__(self, store: DocStore, version: str, files: List[str], digests: Dict[str, str]):
+        self.store = store
+        self.version = version
+        self.files = files
+        self.digests = digests
+        self._cache: Dict[str, object] = {"files": files}
+
+    def __getitem__(self, key: str):
+        if key not in self._LAZY:
+            raise KeyError(key)
+        if key not in self._cache:
+            self._cache[key] = getattr(self, f"_load_{key}")()
+        return self._cache[key]
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def iter_pages(self) -> Iterator[Tuple[str, int, str]]:
+        for file in self.files:
+            if file.endswith((".docx", ".pdf")) and file in self.digests:
+                for page, text in self.store.iter_pages(self.digests[file], self.version):
+                    yield file, page, text
+
+    def _load_pages(self) -> list:
+        return list(self.iter_pages())
+
+    def _load_doc_text(self) -> str:
+        parts = []
+        for file in self.files:
+            if file.endswith((".docx", ".pdf")) and file in self.digests:
+                parts.extend(text + "\n" for _, text in self.store.iter_pages(self.digests[file], self.version))
+                if file.endswith(".pdf"):
+                    parts.append("\n")
+        return "".join(parts)
+
+    def _load_index(self):
+        from utils.text_index import TextIndex
+        return TextIndex.from_docstore(self)
+
+    def _load_tables(self) -> list:
+        out = []
+        for file in self.files:
+            if file.endswith(".xlsx") and file in self.digests:
+                out.extend(self.store.records(self.digests[file], self.version))
+        return out
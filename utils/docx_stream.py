@@ -0,0 +1,112 @@
+import struct
+import time
+import zipfile
+import zlib
+from io import BytesIO
+from typing import Iterator, List, NamedTuple, Tuple
+
+from docx.opc.oxml import serialize_part_xml
+
+DOCUMENT_PART = "word/document.xml"
+CHUNK_SIZE = 256 * 1024
+
+_LOCAL = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL = struct.Struct("<4s4B4HL2L5H2L")
+_END = struct.Struct("<4s4H2LH")
+_DESCRIPTOR = struct.Struct("<4sLLL")
+_UTF8_FLAG = 0x800
+_DESCRIPTOR_FLAG = 0x08
+
+
+class RawEntry(NamedTuple):
+    name: str
+    compress_type: int
+    date_time: Tuple[int, ...]
+    crc: int
+    compress_size: int
+    file_size: int
+    data: bytes  # octets déjà compressés, recopiés tels quels
+
+
+def read_raw_entries(blob: bytes) -> List[RawEntry]:
+    """Membres d'un ZIP avec leurs données compressées brutes (aucune décompression)."""
+    entries = []
+    with zipfile.ZipFile(BytesIO(blob)) as zf:
+        for info in zf.infolist():
+            head = _LOCAL.unpack_from(blob, info.header_offset)
+            start = info.header_offset + _LOCAL.size + head[10] + head[11]
+            entries.append(RawEntry(
+                info.filename, info.compress_type, info.date_time, info.CRC,
+                info.compress_size, info.file_size, blob[start:start + info.compress_size],
+            ))
+    return entries
+
+
+def _dos_time(date_time) -> Tuple[int, int]:
+    y, mo, d, h, mi, s = date_time[:6]
+    return (h << 11) | (mi << 5) | (s // 2), ((y - 1980) << 9) | (mo << 5) | d
+
+
+class DocxSkeleton:
+    """Paquet DOCX figé dont seul word/document.xml est régénéré à chaque requête.
+
+    Construit une fois à partir du paquet enregistré par python-docx : les autres parties
+    (styles, thème, médias…) sont recopiées compressées, sans recompression.
+    """
+
+    def __init__(self, blob: bytes):
+        self.entries = read_raw_entries(blob)
+        if not any(e.name == DOCUMENT_PART for e in self.entries):
+            raise ValueError(f"{DOCUMENT_PART} absent du paquet")
+
+    @classmethod
+    def from_document(cls, doc) -> "DocxSkeleton":
+        buf = BytesIO()
+        doc.save(buf)
+        return cls(buf.getvalue())
+
+    def stream(self, document_xml: bytes, level: int = zlib.Z_DEFAULT_COMPRESSION) -> Iterator[bytes]:
+        """Octets du DOCX, produits au fil de l'eau ; document.xml est compressé par blocs."""
+        central: List[bytes] = []
+        offset = 0
+        for e in self.entries:
+            name = e.name.encode("utf-8")
+            flags = 0 if name.isascii() else _UTF8_FLAG
+            if e.name == DOCUMENT_PART:
+                dos_t, dos_d = _dos_time(time.localtime())
+                flags |= _DESCRIPTOR_FLAG
+                head = _LOCAL.pack(b"PK\003\004", 20, 0, flags, zipfile.ZIP_DEFLATED, dos_t, dos_d, 0, 0, 0, len(name), 0)
+                yield head + name
+                comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+                crc, csize = 0, 0
+                for i in range(0, len(document_xml), CHUNK_SIZE):
+                    piece = document_xml[i:i + CHUNK_SIZE]
+                    crc = zlib.crc32(piece, crc)
+                    out = comp.compress(piece)
+                    if out:
+                        csize += len(out)
+                        yield out
+                out = comp.flush()
+                csize += len(out)
+                usize = len(document_xml)
+                yield out + _DESCRIPTOR.pack(b"PK\007\010", crc, csize, usize)
+                compress_type, local_size = zipfile.ZIP_DEFLATED, len(head) + len(name) + csize + _DESCRIPTOR.size
+            else:
+                dos_t, dos_d = _dos_time(e.date_time)
+                crc, csize, usize, compress_type = e.crc, e.compress_size, e.file_size, e.compress_type
+                head = _LOCAL.pack(b"PK\003\004", 20, 0, flags, compress_type, dos_t, dos_d, crc, csize, usize, len(name), 0)
+                yield head + name
+                yield e.data
+                local_size = len(head) + len(name) + csize
+            central.append(_CENTRAL.pack(
+                b"PK\001\002", 20, 0, 20, 0, flags, compress_type, dos_t, dos_d,
+                crc, csize, usize, len(name), 0, 0, 0, 0, 0, offset,
+            ) + name)
+            offset += local_size
+        directory = b"".join(central)
+        yield directory + _END.pack(b"PK\005\006", 0, 0, len(central), len(central), len(directory), offset, 0)
+
+
+def document_xml(doc) -> bytes:
+    """word/document.xml sérialisé comme python-docx l'écrirait."""
+    return serialize_part_xml(doc.part.element)
@@ -0,0 +1,177 @@
+import copy
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+# {{nom}} ou [[NOM]] ; un nom pointé (ligne.rep) désigne un champ de ligne répétable
+PLACEHOLDER_RE = re.compile(r"\{\{\s*([\w.]+)\s*\}\}|\[\[\s*([\w.]+)\s*\]\]")
+
+_W_P, _W_T, _W_R, _W_TR = qn("w:p"), qn("w:t"), qn("w:r"), qn("w:tr")
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+Path = Tuple[int, ...]
+
+
+class Marker(NamedTuple):
+    name: str
+    # (chemin du w:t, début, fin) ; la valeur est écrite dans le premier segment
+    spans: Tuple[Tuple[Path, int, int], ...]
+
+
+class RowBlock(NamedTuple):
+    name: str
+    path: Path
+    markers: Tuple[Marker, ...]  # chemins relatifs au w:tr
+
+
+class TemplateIndex(NamedTuple):
+    markers: Tuple[Marker, ...]
+    rows: Tuple[RowBlock, ...]
+
+    def names(self) -> set:
+        return {m.name for m in self.markers} | {r.name for r in self.rows}
+
+    def row(self, name: str) -> Optional[RowBlock]:
+        return next((r for r in self.rows if r.name == name), None)
+
+
+def _path(el, root) -> Path:
+    path = []
+    while el is not root:
+        parent = el.getparent()
+        path.append(parent.index(el))
+        el = parent
+    return tuple(reversed(path))
+
+
+def _resolve(root, path: Path):
+    el = root
+    for i in path:
+        el = el[i]
+    return el
+
+
+def _nearest(el, tag, stop):
+    el = el.getparent()
+    while el is not None and el is not stop:
+        if el.tag == tag:
+            return el
+        el = el.getparent()
+    return None
+
+
+def index_template(body) -> TemplateIndex:
+    """Indexe tous les placeholders du body en un seul parcours lxml.
+
+    Les w:t sont regroupés par paragraphe propriétaire (les zones de texte imbriquées
+    restent séparées), ce qui retrouve aussi les marqueurs découpés sur plusieurs runs.
+    Les paragraphes d'un w:tr contenant un nom pointé forment une ligne répétable.
+    """
+    paragraphs: Dict[object, List] = {}
+    for t in body.iter(_W_T):
+        p = _nearest(t, _W_P, body)
+        if p is not None:
+            paragraphs.setdefault(p, []).append(t)
+    flat: List[Tuple[object, Marker]] = []
+    for p, ts in paragraphs.items():
+        text = "".join(t.text or "" for t in ts)
+        if "{{" not in text and "[[" not in text:
+            continue
+        bounds, pos = [], 0
+        for t in ts:
+            n = len(t.text or "")
+            bounds.append((pos, pos + n))
+            pos += n
+        for m in PLACEHOLDER_RE.finditer(text):
+            start, end = m.span()
+            spans = tuple(
+                (_path(t, body), max(start, b0) - b0, min(end, b1) - b0)
+                for t, (b0, b1) in zip(ts, bounds)
+                if b0 < end and b1 > start
+            )
+            flat.append((p, Marker(m.group(1) or m.group(2), spans)))
+    owners = [(_nearest(p, _W_TR, body), marker) for p, marker in flat]
+    blocks: Dict[object, Tuple[str, List[Marker]]] = {}
+    for tr, marker in owners:
+        if tr is not None and "." in marker.name and tr not in blocks:
+            blocks[tr] = (marker.name.split(".", 1)[0], [])
+    markers: List[Marker] = []
+    for tr, marker in owners:
+        if tr in blocks:
+            blocks[tr][1].append(marker)
+        else:
+            markers.append(marker)
+    row_blocks = []
+    for tr, (name, ms) in blocks.items():
+        tr_path = _path(tr, body)
+        n = len(tr_path)
+        rel = tuple(Marker(m.name, tuple((s[0][n:], s[1], s[2]) for s in m.spans)) for m in ms)
+        row_blocks.append(RowBlock(name, tr_path, rel))
+    return TemplateIndex(tuple(markers), tuple(row_blocks))
+
+
+def marker_paragraph(body, index: TemplateIndex, name: str):
+    """w:p du premier marqueur `name` (hors lignes répétables), ou None."""
+    marker = next((m for m in index.markers if m.name == name), None)
+    if marker is None:
+        return None
+    return _nearest(_resolve(body, marker.spans[0][0]), _W_P, body)
+
+
+def _write(t, start: int, end: int, value: str) -> None:
+    text = t.text or ""
+    before, after = text[:start], text[end:]
+    lines = value.split("\n")
+    t.text = before + lines[0] + (after if len(lines) == 1 else "")
+    t.set(_XML_SPACE, "preserve")
+    run = t.getparent()
+    if len(lines) == 1 or run.tag != _W_R:
+        if len(lines) > 1:
+            t.text = before + " ".join(lines) + after
+        return
+    anchor = t
+    for i, line in enumerate(lines[1:], start=1):
+        br = OxmlElement("w:br")
+        anchor.addnext(br)
+        nt = OxmlElement("w:t")
+        nt.text = line + (after if i == len(lines) - 1 else "")
+        nt.set(_XML_SPACE, "preserve")
+        br.addnext(nt)
+        anchor = nt
+
+
+def _apply(root, markers, values: Dict[str, object]) -> None:
+    todo = [m for m in markers if m.name in values]
+    # ordre inverse du document : une substitution ne décale jamais un marqueur restant
+    todo.sort(key=lambda m: (m.spans[0][0], m.spans[0][1]), reverse=True)
+    for m in todo:
+        value = values[m.name]
+        value = "" if value is None else str(value)
+        (path, start, end), rest = m.spans[0], m.spans[1:]
+        for rpath, rstart, rend in reversed(rest):
+            t = _resolve(root, rpath)
+            t.text = (t.text or "")[:rstart] + (t.text or "")[rend:]
+        _write(_resolve(root, path), start, end, value)
+
+
+def render(body, index: TemplateIndex, values: Dict[str, object]) -> None:
+    """Substitue les placeholders au niveau des runs (mise en forme conservée).
+
+    `values[nom]` remplace {{nom}} / [[nom]] ; `values[bloc]` (liste de dicts) duplique
+    la ligne de tableau du bloc pour chaque élément. Les noms absents restent intacts.
+    """
+    _apply(body, index.markers, values)
+    for block in sorted(index.rows, key=lambda r: r.path, reverse=True):
+        items = values.get(block.name)
+        if items is None:
+            continue
+        proto = _resolve(body, block.path)
+        for item in items:
+            row = copy.deepcopy(proto)
+            scoped = dict(values)
+            scoped.update({f"{block.name}.{k}": v for k, v in item.items()})
+            _apply(row, block.markers, scoped)
+            proto.addprevious(row)
+        proto.getparent().remove(proto)
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Optional, Sequence, Tuple
+from urllib.parse import urljoin, urlsplit
+
+if TYPE_CHECKING:
+    import requests
+
+MAX_DOWNLOAD_BYTES = int(os.environ.get("DOWNLOAD_MAX_MB", "500")) * 1024 * 1024
+DOWNLOAD_TIMEOUT_S = float(os.environ.get("DOWNLOAD_TIMEOUT_S", "60"))
+DOWNLOAD_RETRIES = int(os.environ.get("DOWNLOAD_RETRIES", "5"))
+# hôtes autorisés pour les DCE à télécharger : "exemple.fr" (exact) ou ".exemple.fr" (sous-domaines) ;
+# vide : téléchargement par URL désactivé
+ALLOWED_HOSTS = tuple(h.strip().lower() for h in os.environ.get("DOWNLOAD_ALLOWED_HOSTS", "").split(",") if h.strip())
+MAX_REDIRECTS = 5
+# réponses passagères (surcharge, maintenance de la plateforme) : nouvelle tentative comme pour une coupure
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRY_DELAY_S = 30.0
+CHUNK_SIZE = 1024 * 1024
+# lectures réseau plus petites que le tampon d'écriture : une coupure ne perd qu'un bloc
+READ_SIZE = 64 * 1024
+
+# requests n'est importé qu'au premier téléchargement (démarrage à froid)
+_session: "Optional[requests.Session]" = None
+_session_lock = threading.Lock()
+_part_locks: "weakref.WeakValueDictionary[str, threading.RLock]" = weakref.WeakValueDictionary()
+
+
+class DownloadError(Exception):
+    pass
+
+
+class TransientHTTPError(DownloadError):
+    """Statut HTTP passager (RETRY_STATUSES) ; `retry_after` : délai demandé par le serveur, en secondes."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UrlNotAllowed(DownloadError):
+    """URL hors https ou hors liste blanche (évite de faire appeler au serveur une adresse interne)."""
+
+
+def check_url(url: str, hosts: Sequence[str] = ALLOWED_HOSTS) -> None:
+    """Lève UrlNotAllowed si `url` n'est pas en https ou si son hôte n'est pas dans `hosts`."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme != "https" or not host or parts.username or parts.password:
+        raise UrlNotAllowed(f"URL refusée (https uniquement) : {url}")
+    if not any(host == h or (h.startswith(".") and host.endswith(h)) for h in hosts):
+        raise UrlNotAllowed(f"Hôte non autorisé : {host}")
+
+
+def session() -> "requests.Session":
+    """Session partagée : connexions keep-alive réutilisées entre téléchargements."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+@contextmanager
+def part_lock(path: str):
+    """Verrou (réentrant, propre au processus) sur un fichier de téléchargement : deux jobs
+    visant la même URL n'écrivent pas en même temps dans le même .part."""
+    key = os.path.abspath(path)
+    with _session_lock:
+        lock = _part_locks.get(key)
+        if lock is None:
+            lock = _part_locks[key] = threading.RLock()
+    with lock:
+        yield
+
+
+def partial_files(dest: str) -> Tuple[str, str]:
+    """Fichiers d'un téléchargement inachevé vers `dest` : octets reçus et validateur de reprise."""
+    return dest + ".part", dest + ".part.json"
+
+
+def discard_partial(dest: str) -> None:
+    for path in partial_files(dest):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _retry_after(resp) -> Optional[float]:
+    value = resp.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else None
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _validator(resp) -> Optional[str]:
+    etag = resp.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return resp.headers.get("Last-Modified")
+
+
+def _get(url: str, timeout: float, headers: dict, policy: Optional[Callable[[str], None]]):
+    """GET en flux ; les redirections sont suivies à la main pour que `policy` valide chaque saut."""
+    for _ in range(MAX_REDIRECTS + 1):
+        if policy is not None:
+            policy(url)
+        r = session().get(url, stream=True, timeout=timeout, headers=headers, allow_redirects=False)
+        if not (r.is_redirect and r.headers.get("Location")):
+            return r
+        r.close()
+        url = urljoin(url, r.headers["Location"])
+    raise DownloadError(f"Trop de redirections : {url}")
+
+
+def _fetch_once(url: str, part: str, max_bytes: int, timeout: float, policy: Optional[Callable[[str], None]] = check_url) -> bool:
+    """Télécharge (ou reprend) vers `part` ; True si le fichier est complet."""
+    meta_path = part + ".json"
+    have = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {}
+    if have:
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                validator = json.load(f).get("validator")
+        except (OSError, ValueError):
+            validator = None
+        if validator:
+            # If-Range : si la ressource a changé, le serveur renvoie 200 et on repart de zéro
+            headers = {"Range": f"bytes={have}-", "If-Range": validator}
+        else:
+            have = 0
+    with _get(url, timeout, headers, policy) as r:
+        if r.status_code == 416 and have:
+            return True
+        if r.status_code == 206:
+            mode = "ab"
+        elif r.status_code == 200:
+            mode, have = "wb", 0
+        elif r.status_code in RETRY_STATUSES:
+            raise TransientHTTPError(f"HTTP {r.status_code} pour {url}", _retry_after(r))
+        else:
+            raise DownloadError(f"HTTP {r.status_code} pour {url}")
+        length = r.headers.get("Content-Length")
+        expected = have + int(length) if length and length.isdigit() else None
+        if expected is not None and expected > max_bytes:
+            raise DownloadError(f"Archive trop volumineuse ({expected // (1024 * 1024)} Mo, max {max_bytes // (1024 * 1024)} Mo)")
+        if mode == "wb":
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "validator": _validator(r)}, f)
+        size = have
+        with open(part, mode, buffering=CHUNK_SIZE) as f:
+            for chunk in r.iter_content(chunk_size=READ_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise DownloadError(f"Archive trop volumineuse (max {max_bytes // (1024 * 1024)} Mo)")
+                f.write(chunk)
+    return expected is None or size >= expected
+
+
+def download(url: str, dest: str, sha256: Optional[str] = None, max_bytes: int = MAX_DOWNLOAD_BYTES,
+             retries: int = DOWNLOAD_RETRIES, timeout: float = DOWNLOAD_TIMEOUT_S,
+             policy: Optional[Callable[[str], None]] = check_url) -> str:
+    """Télécharge `url` vers `dest` avec reprise HTTP Range ; renvoie le SHA-256 du fichier.
+
+    Les octets reçus s'accumulent dans `dest`.part : une connexion coupée (ou un nouvel
+    appel après échec) reprend là où le transfert s'était arrêté ; une réponse 429/5xx
+    est retentée de même, avec backoff. Échec si la taille dépasse `max_bytes` ou si
+    l'empreinte diffère de `sha256`. `policy` valide l'URL et chaque redirection (par
+    défaut check_url : https et DOWNLOAD_ALLOWED_HOSTS). Les appels concurrents vers
+    un même `dest` sont sérialisés (part_lock).
+    """
+    with part_lock(dest):
+        return _download(url, dest, sha256, max_bytes, retries, timeout, policy)
+
+
+def _download(url: str, dest: str, sha256: Optional[str], max_bytes: int, retries: int, timeout: float,
+              policy: Optional[Callable[[str], None]]) -> str:
+    import requests
+    part, meta_path = partial_files(dest)
+    for attempt in range(retries + 1):
+        delay = min(2 ** attempt, 30) * 0.5
+        try:
+            if _fetch_once(url, part, max_bytes, timeout, policy):
+                break
+        except TransientHTTPError as e:
+            if attempt == retries:
+                raise
+            delay = min(max(delay, e.retry_after or 0), MAX_RETRY_DELAY_S)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            if attempt == retries:
+                raise
+        if attempt == retries:
+            raise DownloadError(f"Téléchargement incomplet après {retries + 1} tentatives : {url}")
+        time.sleep(delay)
+    digest = _sha256(part)
+    if sha256 and digest.lower() != sha256.lower():
+        discard_partial(dest)
+        raise DownloadError(f"Empreinte SHA-256 inattendue ({digest})")
+    os.replace(part, dest)
+    try:
+        os.remove(meta_path)
+    except OSError:
+        pass
+    return digest
@@ -1,16 +1,103 @@
 import fitz  # PyMuPDF
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional
 
-def extract_images_from_pdf(folder):
-    visuels = []
-    for file in os.listdir(folder):
-        if file.lower().endswith(".pdf"):
-            pdf_path = os.path.join(folder, file)
-            doc = fitz.open(pdf_path)
-            for i, page in enumerate(doc):
-                image_path = os.path.join(folder, f"visuel_{i}.png")
-                pix = page.get_pixmap()
-                pix.save(image_path)
-                visuels.append(image_path)
-            break  # On prend le premier PDF trouvé avec des visuels
-    return visuels# Extraction visuels PDF
+from utils.docstore import file_digest
+
+VISUELS_LIMIT = int(os.environ.get("VISUELS_LIMIT", "5"))
+VISUELS_DPI = int(os.environ.get("VISUELS_DPI", "110"))
+VISUELS_CACHE_DIR = os.environ.get("VISUELS_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "marchia-visuels")
+# part minimale de la page couverte par une image intégrée pour la reprendre telle quelle
+EMBEDDED_MIN_COVERAGE = 0.6
+
+
+class PageScore(NamedTuple):
+    pdf: str
+    page: int  # à partir de 0
+    score: float
+    xref: Optional[int]  # image intégrée réutilisable sans rendu, sinon None
+
+
+def _score_page(pdf_path, page) -> PageScore:
+    """Score bon marché, sans rendu : surface d'images + densité de tracés vectoriels vs texte."""
+    area = abs(page.rect) or 1.0
+    best_xref, best_cover, image_cover = None, 0.0, 0.0
+    for img in page.get_images(full=True):
+        xref = img[0]
+        for rect in page.get_image_rects(xref):
+            cover = abs(rect & page.rect) / area
+            image_cover += cover
+            if cover > best_cover:
+                best_xref, best_cover = xref, cover
+    vectors = len(page.get_cdrawings())
+    text = len(page.get_text("text").strip())
+    score = min(image_cover, 1.0) * 2 + vectors / (vectors + text + 50)
+    return PageScore(pdf_path, page.number, score, best_xref if best_cover >= EMBEDDED_MIN_COVERAGE else None)
+
+
+def rank_pages(pdf_paths: List[str]) -> List[PageScore]:
+    """Pages des PDF triées de la plus à la moins « visuelle » ; pages sans image ni tracé exclues."""
+    scores = []
+    for pdf_path in pdf_paths:
+        with fitz.open(pdf_path) as doc:
+            scores.extend(s for s in (_score_page(pdf_path, page) for page in doc) if s.score > 0)
+    return sorted(scores, key=lambda s: -s.score)
+
+
+def _cache_path(digest, page, dpi, ext):
+    return os.path.join(VISUELS_CACHE_DIR, f"{digest[:32]}-p{page}-{dpi}.{ext}")
+
+
+def _render(job) -> str:
+    """Écrit le visuel d'une page dans le cache : image intégrée extraite telle quelle, sinon rendu à `dpi`."""
+    pdf_path, digest, page_no, xref, dpi = job
+    with fitz.open(pdf_path) as doc:
+        if xref is not None:
+            img = doc.extract_image(xref)
+            if img and img.get("ext") in ("png", "jpeg", "jpg"):
+                path = _cache_path(digest, page_no, "img", img["ext"])
+                _write_atomic(path, img["image"])
+                return path
+        path = _cache_path(digest, page_no, dpi, "png")
+        _write_atomic(path, doc[page_no].get_pixmap(dpi=dpi).tobytes("png"))
+        return path
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _cached(digest, page, xref, dpi) -> Optional[str]:
+    candidates = [_cache_path(digest, page, "img", e) for e in ("png", "jpeg", "jpg")] if xref is not None else []
+    candidates.append(_cache_path(digest, page, dpi, "png"))
+    return next((p for p in candidates if os.path.exists(p)), None)
+
+
+def extract_images_from_pdf(folder, limit=VISUELS_LIMIT, dpi=VISUELS_DPI, workers=None):
+    """Chemins des `limit` visuels les plus pertinents des PDF de `folder`, par score décroissant.
+
+    Les pages sont classées sans rendu ; seules les retenues sont extraites, en parallèle
+    (workers=1 : dans le processus courant). Résultats mis en cache par (empreinte du PDF, page, dpi).
+    """
+    pdfs = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(".pdf"))
+    if not pdfs or limit <= 0:
+        return []
+    os.makedirs(VISUELS_CACHE_DIR, exist_ok=True)
+    digests = {p: file_digest(p) for p in pdfs}
+    top = rank_pages(pdfs)[:limit]
+
+    visuels: List[Optional[str]] = [_cached(digests[s.pdf], s.page, s.xref, dpi) for s in top]
+    todo = [(i, (s.pdf, digests[s.pdf], s.page, s.xref, dpi)) for i, s in enumerate(top) if visuels[i] is None]
+    if len(todo) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(todo))) as ex:
+            for (i, _), path in zip(todo, ex.map(_render, [job for _, job in todo])):
+                visuels[i] = path
+    else:
+        for i, job in todo:
+            visuels[i] = _render(job)
+    return visuels
@@ -1,6 +1,33 @@
 import zipfile
 import os
+import shutil
 
 def extract_zip_content(zip_path, output_dir):
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
         zip_ref.extractall(output_dir)# Extraction et tri du zip
+
+class MemberTooLarge(Exception):
+    pass
+
+def extract_selected(zip_path, output_dir, keep=None, max_member_bytes=None, chunk_size=1024 * 1024):
+    """Extrait en flux les seuls membres retenus par `keep(nom)`, en refusant les chemins hors de output_dir.
+
+    Seul le répertoire central est lu d'avance ; chaque membre est recopié par blocs,
+    sans passer entièrement en mémoire. Retourne les chemins extraits.
+    """
+    root = os.path.realpath(output_dir)
+    out = []
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        for info in zf.infolist():
+            if info.is_dir() or (keep is not None and not keep(info.filename)):
+                continue
+            if max_member_bytes is not None and info.file_size > max_member_bytes:
+                raise MemberTooLarge(info.filename)
+            target = os.path.realpath(os.path.join(root, info.filename))
+            if not target.startswith(root + os.sep):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with zf.open(info) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, chunk_size)
+            out.append(target)
+    return out
@@ -0,0 +1,32 @@
+import json
+from functools import lru_cache
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+@lru_cache(maxsize=1)
+def _orjson():
+    """orjson s'il est installé (optionnel), sinon None : repli sur json."""
+    try:
+        import orjson  # type: ignore
+    except Exception:
+        return None
+    return orjson
+
+
+def dumps(obj: Any) -> bytes:
+    """JSON compact en UTF-8, même sortie que JSONResponse de Starlette (à NaN près, null avec orjson)."""
+    orjson = _orjson()
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse sérialisée par `dumps` (orjson si disponible)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
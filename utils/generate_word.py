@@ -1,6 +1,10 @@
 from docx import Document
 from docx.shared import Inches
 
+from utils.image_prep import prepare_image
+
+VISUEL_WIDTH_IN = 5.5
+
 def generate_consultation_doc(template_path, output_path, chantier, descriptif, tableau, visuels):
     doc = Document(template_path)
 
@@ -30,7 +34,7 @@ def generate_consultation_doc(template_path, output_path, chantier, descriptif,
     doc.add_heading("🔍 Visuels des châssis extraits du DCE", level=1)
     if visuels:
         for img_path in visuels[:5]:  # On limite à 5 images pour éviter surcharge
-            doc.add_picture(img_path, width=Inches(5.5))
+            doc.add_picture(prepare_image(img_path, VISUEL_WIDTH_IN), width=Inches(VISUEL_WIDTH_IN))
     else:
         doc.add_paragraph("Aucun visuel trouvé dans les pièces jointes.")
 
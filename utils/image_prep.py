@@ -0,0 +1,66 @@
+import hashlib
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+IMAGE_DPI = int(os.environ.get("FICHE_IMAGE_DPI", "150"))
+JPEG_QUALITY = int(os.environ.get("FICHE_JPEG_QUALITY", "80"))
+IMAGE_CACHE_DIR = os.environ.get("FICHE_IMAGE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "marchia-images")
+# dessin au trait : fond quasi blanc sur au moins cette part de la vignette
+LINE_ART_MIN_BACKGROUND = 0.6
+
+
+def _is_line_art(im: Image.Image) -> bool:
+    thumb = im.convert("L")
+    thumb.thumbnail((256, 256))
+    hist = thumb.histogram()
+    return sum(hist[235:]) >= LINE_ART_MIN_BACKGROUND * thumb.width * thumb.height
+
+
+def _encode(im: Image.Image, width_px: int) -> bytes:
+    if im.width > width_px:
+        im = im.resize((width_px, max(1, round(im.height * width_px / im.width))), Image.LANCZOS, reducing_gap=1.5)
+    out = io.BytesIO()
+    if im.mode in ("RGBA", "LA") or "transparency" in im.info:
+        im.convert("RGBA").save(out, "PNG", optimize=True)
+    elif _is_line_art(im):
+        # plans, schémas : PNG palette, net et compact
+        im.convert("RGB").quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(out, "PNG", optimize=True)
+    else:
+        im.convert("RGB").save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def prepare_image(path: str, width_in: float, dpi: int = IMAGE_DPI) -> io.BytesIO:
+    """Image rééchantillonnée à la taille d'affichage (`width_in` pouces à `dpi`) et recompressée.
+
+    JPEG pour les photos, PNG palette pour le dessin au trait. Le résultat est mis en cache
+    par (empreinte du fichier, largeur en pixels) ; des sources identiques donnent des octets
+    identiques, que python-docx ne stocke qu'une fois dans le paquet.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    width_px = max(1, round(width_in * dpi))
+    key = f"{hashlib.sha256(raw).hexdigest()[:32]}-{width_px}"
+    cached = os.path.join(IMAGE_CACHE_DIR, key)
+    try:
+        with open(cached, "rb") as f:
+            return io.BytesIO(f.read())
+    except OSError:
+        pass
+    with Image.open(io.BytesIO(raw)) as im:
+        im.load()
+        data = _encode(im, width_px)
+        if len(data) >= len(raw) and im.width <= width_px:
+            data = raw  # déjà compact et pas plus grand que nécessaire
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, cached)
+    except OSError:
+        pass
+    return io.BytesIO(data)
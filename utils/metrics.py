@@ -0,0 +1,301 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "1") != "0"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# étapes : de la demi-milliseconde à la minute ; requêtes : jusqu'à 2 minutes
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    """Métrique Prometheus minimale (sans dépendance), sûre entre threads.
+
+    `fn` : valeur lue au moment du scrape (métrique sans label), pour exposer
+    un compteur tenu ailleurs (ex. hits du cache de résultats).
+    """
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (), fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._fn = fn
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} : labels attendus {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def _add(self, amount: float, labels: Sequence[str]) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        if self._fn is not None:
+            yield f"{self.name} {_fmt(self._fn())}"
+            return
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_fmt(v)}"
+
+    def expose(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}", *self.samples()])
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        self._add(amount, labels)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        self._add(amount, labels)
+
+    def dec(self, amount: float = 1.0, *labels: str) -> None:
+        self._add(-amount, labels)
+
+    def set(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def get(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((k, list(s[0]), s[1]) for k, s in self._values.items())
+        names = self.labelnames + ("le",)
+        for key, counts, total in items:
+            cum = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cum += n
+                yield f"{self.name}_bucket{_labels(names, key + (_fmt(bound),))} {cum}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cum}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def expose(self) -> bytes:
+        """Format texte Prometheus 0.0.4."""
+        return ("\n".join(m.expose() for m in self._metrics) + "\n").encode("utf-8")
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram("marchia_stage_seconds", "Durée des étapes de génération", ("stage",))
+JOB_STAGE_SECONDS = Histogram("marchia_job_stage_seconds", "Durée des étapes des jobs d'analyse (agents)", ("stage", "status"))
+REQUEST_SECONDS = Histogram("marchia_http_request_seconds", "Durée des requêtes HTTP, jusqu'au dernier octet", ("route", "status"), REQUEST_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge("marchia_http_requests_in_flight", "Requêtes HTTP en cours", ("route",))
+BYTES_IN = Counter("marchia_http_request_bytes_total", "Octets reçus (corps des requêtes)", ("route",))
+BYTES_OUT = Counter("marchia_http_response_bytes_total", "Octets envoyés (corps des réponses)", ("route",))
+ROWS_PARSED = Counter("marchia_rows_parsed_total", "Lignes de quantitatif lues", ("format",))
+STARTUP_SECONDS = Gauge("marchia_startup_seconds", "Durée des phases du démarrage (import de main, warm-up)", ("phase",))
+
+
+# ---------- Étapes ----------
+_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("marchia_timings", default=None)
+# lignes lues par format pendant un job d'un processus de travail (voir run_collected)
+_rows: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar("marchia_rows", default=None)
+
+
+def count_rows(n: int, fmt: str) -> None:
+    ROWS_PARSED.inc(n, fmt)
+    rows = _rows.get()
+    if rows is not None:
+        rows[fmt] = rows.get(fmt, 0) + n
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    if METRICS_ENABLED:
+        STAGE_SECONDS.observe(seconds, name)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    """Chronomètre une étape : histogramme + entrée Server-Timing de la requête courante."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - t0)
+
+
+def timed_iter(name: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Comme `stage`, pour un flux : seul le temps passé à produire les morceaux est compté."""
+    total = 0.0
+    it = iter(chunks)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                chunk = next(it)
+            except StopIteration:
+                break
+            finally:
+                total += time.perf_counter() - t0
+            yield chunk
+    finally:
+        observe_stage(name, total)
+
+
+def run_collected(fn, *args) -> Tuple[object, List[Tuple[str, float]], Dict[str, int]]:
+    """Côté processus de travail : (résultat, étapes, lignes lues par format) de `fn(*args)`.
+
+    Les métriques d'un processus enfant ne sont jamais exposées ; le parent les rejoue
+    avec `replay_collected`, y compris dans le Server-Timing de la requête.
+    """
+    timings: List[Tuple[str, float]] = []
+    rows: Dict[str, int] = {}
+    tokens = _timings.set(timings), _rows.set(rows)
+    try:
+        return fn(*args), timings, rows
+    finally:
+        _timings.reset(tokens[0])
+        _rows.reset(tokens[1])
+
+
+def replay_collected(timings: List[Tuple[str, float]], rows: Dict[str, int]) -> None:
+    for name, seconds in timings:
+        observe_stage(name, seconds)
+    for fmt, n in rows.items():
+        count_rows(n, fmt)
+
+
+def server_timing(timings: List[Tuple[str, float]]) -> str:
+    """En-tête Server-Timing ; une étape répétée (plusieurs lots) est cumulée."""
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in merged.items())
+
+
+# ---------- Middleware ----------
+class MetricsMiddleware:
+    """Middleware ASGI : durée, octets et requêtes en cours par route, en-tête Server-Timing.
+
+    La route (gabarit, ex. /jobs/{job_id}) est résolue avant l'appel sur `routes`.
+    Les étapes chronométrées avant l'envoi des en-têtes figurent dans Server-Timing
+    (plus `total`) ; celles d'une réponse en flux (écriture du DOCX) ne vont qu'aux
+    histogrammes. `profiler` (optionnel) échantillonne les requêtes lentes.
+    """
+
+    def __init__(self, app, routes: Sequence = (), profiler=None, skip: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.routes = routes
+        self.profiler = profiler
+        self.skip = tuple(skip)
+
+    def _route(self, scope) -> str:
+        from starlette.routing import Match
+        for r in self.routes:
+            if r.matches(scope)[0] == Match.FULL:
+                return getattr(r, "path", "other")
+        return "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            await self.app(scope, receive, send)
+            return
+        route = self._route(scope)
+        timings: List[Tuple[str, float]] = []
+        token = _timings.set(timings)
+        t0 = time.perf_counter()
+        status = 500
+        sent = received = 0
+        session = self.profiler.start() if self.profiler is not None else None
+
+        async def receive_counted():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_timed(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    value = server_timing(timings + [("total", time.perf_counter() - t0)])
+                    message = dict(message, headers=[*message.get("headers", []), (b"server-timing", value.encode("latin-1"))])
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(1, route)
+        try:
+            await self.app(scope, receive_counted, send_timed)
+        finally:
+            elapsed = time.perf_counter() - t0
+            REQUESTS_IN_FLIGHT.dec(1, route)
+            if METRICS_ENABLED:
+                REQUEST_SECONDS.observe(elapsed, route, str(status))
+                BYTES_IN.inc(received, route)
+                BYTES_OUT.inc(sent, route)
+            if session is not None:
+                # écriture du profil (fichier) hors de la boucle
+                from starlette.concurrency import run_in_threadpool
+                await run_in_threadpool(self.profiler.stop, session, elapsed, f"{scope['method']} {route}")
+            _timings.reset(token)
@@ -0,0 +1,98 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_DEPTH = 64
+# threads au repos (pools en attente, boucle sur select) : ignorés
+_IDLE_FILES = ("threading.py", "thread.py", "selectors.py", "queue.py")
+
+
+class _Session:
+    __slots__ = ("stacks", "samples")
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+
+def _collapse(frame) -> Optional[str]:
+    """Pile au format « replié » (flamegraph.pl, speedscope) : racine;…;feuille ; None si au repos."""
+    if os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+        return None
+    parts: List[str] = []
+    while frame is not None and len(parts) < PROFILE_MAX_DEPTH:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class SamplingProfiler:
+    """Profileur par échantillonnage, activé seulement si PROFILE_SLOW_MS > 0.
+
+    Tant qu'au moins une requête est en cours, un thread relève les piles de tous les
+    threads (boucle asyncio et pools de travail) toutes les `interval_ms`. Une requête
+    plus lente que `threshold_ms` écrit ses échantillons dans `out_dir` au format
+    replié ; les requêtes concurrentes partagent les mêmes échantillons.
+    """
+
+    def __init__(self, threshold_ms: float, out_dir: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.threshold_s = threshold_ms / 1000
+        self.out_dir = out_dir
+        self.interval_s = interval_ms / 1000
+        self._lock = threading.Lock()
+        self._sessions: Dict[int, _Session] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["SamplingProfiler"]:
+        if PROFILE_SLOW_MS <= 0:
+            return None
+        return cls(PROFILE_SLOW_MS)
+
+    def start(self) -> _Session:
+        session = _Session()
+        with self._lock:
+            self._sessions[id(session)] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="marchia-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return session
+
+    def stop(self, session: _Session, elapsed_s: float, label: str) -> Optional[str]:
+        """Termine la session ; renvoie le chemin du profil écrit si la requête était lente."""
+        with self._lock:
+            self._sessions.pop(id(session), None)
+        if elapsed_s < self.threshold_s or not session.samples:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        slug = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+        path = os.path.join(self.out_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{int(elapsed_s * 1000)}ms.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in session.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        return path
+
+    def _loop(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._sessions.values())
+                if not sessions:
+                    self._wake.clear()
+            if not sessions:
+                self._wake.wait()
+                continue
+            stacks = [st for st in (_collapse(f) for tid, f in sys._current_frames().items() if tid != me) if st]
+            for session in sessions:
+                session.samples += 1
+                session.stacks.update(stacks)
+            time.sleep(self.interval_s)
@@ -0,0 +1,199 @@
+import codecs
+import csv
+import io
+import unicodedata
+import zlib
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+PDF_MEDIA_TYPE = "application/pdf"
+
+Row = Sequence[object]
+
+# début de cellule lu comme une formule par Excel / LibreOffice (injection de formules)
+_FORMULA_START = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _is_formula(value: object) -> bool:
+    return isinstance(value, str) and value.startswith(_FORMULA_START)
+
+
+# ---------- CSV ----------
+def csv_chunks(headers: Row, rows: Iterable[Row], delimiter: str = ";", batch: int = 500) -> Iterator[bytes]:
+    """CSV UTF-8 avec BOM (ouverture directe dans Excel), émis par paquets de `batch` lignes.
+
+    Une cellule qui commencerait une formule (=, +, -, @) est préfixée d'une apostrophe.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter, lineterminator="\r\n")
+    writer.writerow(headers)
+    yield "\ufeff".encode("utf-8") + buf.getvalue().encode("utf-8")
+    buf.seek(0)
+    buf.truncate()
+    n = 0
+    for row in rows:
+        writer.writerow(["'" + v if _is_formula(v) else v for v in row])
+        n += 1
+        if n % batch == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+# ---------- XLSX ----------
+def xlsx_bytes(title: str, headers: Row, rows: Iterable[Row]) -> bytes:
+    """Classeur écrit en mode write-only : les lignes ne sont jamais toutes en mémoire sous forme de cellules.
+
+    Le ZIP n'est assemblé qu'à l'enregistrement : le classeur est renvoyé entier, pas en flux.
+    Un texte commençant par « = » reste du texte (openpyxl en ferait une formule).
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=(title or "Quantitatif")[:31].translate(str.maketrans("[]:*?/\\", "_______")))
+    ws.freeze_panes = "A2"
+    ws.append(list(headers))
+
+    def text(value):
+        cell = WriteOnlyCell(ws, value)
+        cell.data_type = "s"
+        return cell
+
+    for row in rows:
+        ws.append([text(v) if _is_formula(v) else v for v in row])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+# ---------- PDF ----------
+_PAGE_W, _PAGE_H, _MARGIN = 842.0, 595.0, 28.0  # A4 paysage
+_FONT_SIZE, _ROW_H = 8.5, 13.0
+# largeurs Helvetica approchées (em) pour tronquer les cellules
+_NARROW, _WIDE = set("iljtf.,;:!|'()[] I"), set("mwMW@%")
+
+
+def _text_width(s: str, size: float) -> float:
+    return size * sum(0.28 if c in _NARROW else 0.83 if c in _WIDE else 0.67 if c.isupper() else 0.53 for c in s)
+
+
+# polices standard en WinAnsiEncoding (cp1252) : équivalents lisibles des symboles courants des DPGF/CCTP
+_WINANSI = str.maketrans({
+    "≤": "<=", "≥": ">=", "≠": "!=", "≈": "~", "−": "-", "‐": "-", "‑": "-", "⁄": "/",
+    "→": "->", "←": "<-", "⇒": "=>", "∞": "inf", "√": "racine ", "Δ": "delta ", "λ": "lambda ",
+    "Ω": "ohm", "∅": "diam.", "\u2009": " ", "\u202f": " ", "\u2007": " ", "\u200b": "",
+})
+
+
+def _winansi_fallback(err: UnicodeEncodeError):
+    # reste hors cp1252 : lettre de base si elle existe (ő -> o), sinon « ? »
+    c = err.object[err.start]
+    base = unicodedata.normalize("NFKD", c).encode("ascii", "ignore").decode("ascii")
+    return base or "?", err.start + 1
+
+
+codecs.register_error("marchia-winansi", _winansi_fallback)
+
+
+def _fit(s: str, width: float, size: float) -> str:
+    s = " ".join(str(s).translate(_WINANSI).split())
+    if _text_width(s, size) <= width:
+        return s
+    s = s[:int(width / (size * 0.28)) + 1]
+    while s and _text_width(s + "...", size) > width:
+        s = s[:-1]
+    return s + "..."
+
+
+def _pdf_str(s: str) -> bytes:
+    raw = s.translate(_WINANSI).encode("cp1252", "marchia-winansi")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _page_stream(title: str, headers: Row, widths: List[float], rows: List[Row], page_no: int) -> bytes:
+    out = [b"BT /F2 12 Tf %.1f %.1f Td %s Tj ET" % (_MARGIN, _PAGE_H - _MARGIN - 12, _pdf_str(_fit(title, _PAGE_W - 2 * _MARGIN, 12)))]
+    y = _PAGE_H - _MARGIN - 34
+    table_top = y + _ROW_H - 3
+    for r, row in enumerate([headers] + rows):
+        font = b"/F2" if r == 0 else b"/F1"
+        x = _MARGIN
+        for w, cell in zip(widths, row):
+            text = _fit("" if cell is None else str(cell), w - 6, _FONT_SIZE)
+            if text:
+                out.append(b"BT %s %.1f Tf %.1f %.1f Td %s Tj ET" % (font, _FONT_SIZE, x + 3, y, _pdf_str(text)))
+            x += w
+        y -= _ROW_H
+    # grille : lignes horizontales puis verticales
+    bottom = y + _ROW_H - 3
+    grid = [b"0.6 w"]
+    for i in range(len(rows) + 2):
+        yy = table_top - i * _ROW_H
+        grid.append(b"%.1f %.1f m %.1f %.1f l" % (_MARGIN, yy, _MARGIN + sum(widths), yy))
+    x = _MARGIN
+    for w in [0.0] + widths:
+        x += w
+        grid.append(b"%.1f %.1f m %.1f %.1f l" % (x, table_top, x, bottom))
+    grid.append(b"S")
+    out.append(b"\n".join(grid))
+    out.append(b"BT /F1 8 Tf %.1f %.1f Td %s Tj ET" % (_PAGE_W - _MARGIN - 40, _MARGIN / 2, _pdf_str(f"Page {page_no}")))
+    return b"\n".join(out)
+
+
+def pdf_chunks(title: str, headers: Row, widths: Sequence[float], rows: Iterable[Row]) -> Iterator[bytes]:
+    """PDF du tableau écrit page par page (polices standard Helvetica, aucune dépendance).
+
+    `widths` sont des proportions de colonnes. Objets : 1 catalogue, 2 arbre des pages,
+    3-4 polices, puis (contenu, page) par page ; l'arbre des pages est écrit en dernier.
+    """
+    usable = _PAGE_W - 2 * _MARGIN
+    total = float(sum(widths))
+    col_w = [usable * w / total for w in widths]
+    per_page = int((_PAGE_H - 2 * _MARGIN - 40) // _ROW_H) - 1
+
+    offsets: List[Tuple[int, int]] = []
+    pos = 0
+
+    def obj(num: int, body: bytes) -> bytes:
+        nonlocal pos
+        offsets.append((num, pos))
+        data = b"%d 0 obj\n" % num + body + b"\nendobj\n"
+        pos += len(data)
+        return data
+
+    head = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    pos = len(head)
+    yield head + obj(1, b"<< /Type /Catalog /Pages 2 0 R >>") \
+        + obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>") \
+        + obj(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+
+    kids: List[int] = []
+    next_num = 5
+
+    def pages() -> Iterator[List[Row]]:
+        page: List[Row] = []
+        for row in rows:
+            page.append(row)
+            if len(page) == per_page:
+                yield page
+                page = []
+        if page or not kids:
+            yield page
+
+    for page_rows in pages():
+        content = zlib.compress(_page_stream(title, headers, col_w, page_rows, len(kids) + 1))
+        content_num, page_num = next_num, next_num + 1
+        next_num += 2
+        kids.append(page_num)
+        yield obj(content_num, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content) + content + b"\nendstream") \
+            + obj(page_num, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                  b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (_PAGE_W, _PAGE_H, content_num))
+
+    tail = obj(2, b"<< /Type /Pages /Count %d /Kids [%s] >>" % (len(kids), b" ".join(b"%d 0 R" % k for k in kids)))
+    xref_pos = pos
+    table = dict(offsets)
+    xref = [b"xref\n0 %d\n" % next_num, b"0000000000 65535 f \n"]
+    xref.extend(b"%010d 00000 n \n" % table[n] for n in range(1, next_num))
+    yield tail + b"".join(xref) + b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_num, xref_pos)
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+
+class CachedResult(NamedTuple):
+    media_type: str
+    filename: str
+    content: bytes
+
+
+class ResultCache:
+    """Cache LRU de fiches générées, indexé par empreinte de contenu.
+
+    Niveau mémoire borné à `max_bytes` ; niveau disque optionnel (`disk_dir`) borné
+    à `disk_max_bytes`, évincé par dernier accès (mtime). Chaque fichier disque contient une
+    ligne d'entête JSON (type, nom) suivie du contenu brut.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._mem: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(
+            max_bytes=int(os.environ.get("RESULT_CACHE_MB", "64")) * 1024 * 1024,
+            disk_dir=os.environ.get("RESULT_CACHE_DIR") or None,
+            disk_max_bytes=int(os.environ.get("RESULT_CACHE_DISK_MB", "1024")) * 1024 * 1024,
+        )
+
+    @property
+    def entry_limit(self) -> int:
+        """Taille au-delà de laquelle un résultat n'entre dans aucun des deux niveaux."""
+        return max(self.max_bytes, self.disk_max_bytes if self.disk_dir else 0)
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return hit
+        hit = self._disk_get(key)
+        if hit is not None:
+            self._mem_put(key, hit)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return hit
+
+    def put(self, key: str, result: CachedResult) -> None:
+        self._mem_put(key, result)
+        self._disk_put(key, result)
+
+    def _mem_put(self, key: str, result: CachedResult) -> None:
+        size = len(result.content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._size -= len(old.content)
+            self._mem[key] = result
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._mem.popitem(last=False)
+                self._size -= len(evicted.content)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _disk_get(self, key: str) -> Optional[CachedResult]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                head = json.loads(f.readline())
+                content = f.read()
+            os.utime(path, None)
+        except (OSError, ValueError):
+            return None
+        return CachedResult(head["media_type"], head["filename"], content)
+
+    def _disk_put(self, key: str, result: CachedResult) -> None:
+        if not self.disk_dir or len(result.content) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        head = json.dumps({"media_type": result.media_type, "filename": result.filename}, ensure_ascii=False)
+        try:
+            with open(tmp, "wb") as f:
+                f.write(head.encode("utf-8") + b"\n")
+                f.write(result.content)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._disk_prune()
+
+    def _disk_prune(self) -> None:
+        try:
+            entries = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".bin")]
+        except OSError:
+            return
+        stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+        total = sum(s for _, s, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
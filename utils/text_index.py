@@ -0,0 +1,194 @@
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+_LIGATURES = {"œ": "oe", "æ": "ae", "ß": "ss", "Œ": "oe", "Æ": "ae"}
+
+
+@lru_cache(maxsize=65536)
+def _fold_char(c: str) -> str:
+    if c in _LIGATURES:
+        return _LIGATURES[c]
+    base = "".join(x for x in unicodedata.normalize("NFKD", c) if not unicodedata.combining(x))
+    return base.lower() or c.lower()
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents (é → e, œ → oe), comme le texte indexé."""
+    if text.isascii():
+        return text.lower()
+    return "".join(_fold_char(c) for c in text)
+
+
+def _fold_with_offsets(text: str) -> Tuple[str, Optional[array]]:
+    """Texte replié + position d'origine de chaque caractère (None si les longueurs coïncident)."""
+    if text.isascii():
+        return text.lower(), None
+    parts = [_fold_char(c) for c in text]
+    folded = "".join(parts)
+    if len(folded) == len(text):
+        return folded, None
+    offsets = array("l")
+    for i, p in enumerate(parts):
+        offsets.extend([i] * len(p))
+    offsets.append(len(text))
+    return folded, offsets
+
+
+class Hit(NamedTuple):
+    file: Optional[str]
+    page: Optional[int]
+    start: int  # positions dans le texte d'origine de la page
+    end: int
+
+
+class PageMatch:
+    """re.Match obtenu sur le texte replié, dont les groupes sont lus dans le texte d'origine
+    de la page : casse et accents conservés (« Délai : 12 SEMAINES », pas « delai : 12 semaines »)."""
+
+    __slots__ = ("match", "_text", "_offsets")
+
+    def __init__(self, match: "re.Match", text: str, offsets: Optional[array]):
+        self.match = match
+        self._text = text
+        self._offsets = offsets
+
+    def span(self, group=0) -> Tuple[int, int]:
+        start, end = self.match.span(group)
+        if start < 0 or self._offsets is None:
+            return start, end
+        return self._offsets[start], self._offsets[end]
+
+    def group(self, group=0) -> Optional[str]:
+        start, end = self.span(group)
+        return None if start < 0 else self._text[start:end]
+
+    def groupdict(self, default=None) -> Dict[str, Optional[str]]:
+        return {name: default if value is None else value
+                for name, value in ((n, self.group(n)) for n in self.match.groupdict())}
+
+    def __getitem__(self, group) -> Optional[str]:
+        return self.group(group)
+
+
+class TextIndex:
+    """Index inversé positionnel du texte d'un DCE, construit une fois par docstore.
+
+    Le texte est replié (minuscules, sans accents) puis découpé en mots ; chaque mot
+    pointe vers ses occurrences (fichier, page, position). `find` cherche un mot ou une
+    expression (mots consécutifs), `search` une regex sur le texte replié. Le texte
+    d'origine est gardé à côté pour restituer les captures telles qu'écrites.
+    """
+
+    def __init__(self, pages: Iterable[Tuple[Optional[str], Optional[int], str]]):
+        self._pages: List[Tuple[Optional[str], Optional[int], str, Optional[array], str]] = []
+        self._page_base = array("l")  # id du premier mot de chaque page
+        self._starts = array("l")
+        self._ends = array("l")
+        postings: Dict[str, array] = {}
+        for file, page, text in pages:
+            folded, offsets = _fold_with_offsets(text or "")
+            self._page_base.append(len(self._starts))
+            self._pages.append((file, page, folded, offsets, text or ""))
+            for m in _TOKEN_RE.finditer(folded):
+                tok_id = len(self._starts)
+                self._starts.append(m.start())
+                self._ends.append(m.end())
+                ids = postings.get(m.group())
+                if ids is None:
+                    ids = postings[m.group()] = array("l")
+                ids.append(tok_id)
+        self._postings = postings
+        self._vocab: Optional[List[str]] = None
+
+    @classmethod
+    def from_docstore(cls, docstore) -> "TextIndex":
+        if hasattr(docstore, "iter_pages"):
+            return cls(docstore.iter_pages())
+        pages = docstore.get("pages")
+        if pages is None:
+            pages = [(None, None, docstore.get("doc_text", ""))]
+        return cls(pages)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def _page_of(self, tok_id: int) -> int:
+        return bisect_right(self._page_base, tok_id) - 1
+
+    def _hit(self, page_idx: int, start: int, end: int) -> Hit:
+        file, page, _, offsets, _ = self._pages[page_idx]
+        if offsets is not None:
+            start, end = offsets[start], offsets[end]
+        return Hit(file, page, start, end)
+
+    def _ids(self, token: str, prefix: bool) -> List[int]:
+        if not prefix:
+            return list(self._postings.get(token, ()))
+        if self._vocab is None:
+            self._vocab = sorted(self._postings)
+        lo = bisect_left(self._vocab, token)
+        hi = bisect_left(self._vocab, token + "\U0010ffff")
+        ids: List[int] = []
+        for word in self._vocab[lo:hi]:
+            ids.extend(self._postings[word])
+        ids.sort()
+        return ids
+
+    def _match_ids(self, term: str, prefix: bool) -> Tuple[List[int], int]:
+        tokens = _TOKEN_RE.findall(fold(term))
+        if not tokens:
+            return [], 0
+        n = len(tokens)
+        first = self._ids(tokens[0], prefix and n == 1)
+        if n == 1:
+            return first, 1
+        follow = [set(self._ids(t, prefix and k == n - 1)) for k, t in enumerate(tokens[1:], start=1)]
+        out = []
+        for i in first:
+            if all(i + k in ids for k, ids in enumerate(follow, start=1)) and self._page_of(i) == self._page_of(i + n - 1):
+                out.append(i)
+        return out, n
+
+    def find(self, term: str, prefix: bool = False) -> List[Hit]:
+        """Occurrences du mot ou de l'expression `term` ; `prefix` étend le dernier mot (penalite → penalites)."""
+        ids, n = self._match_ids(term, prefix)
+        return [self._hit(self._page_of(i), self._starts[i], self._ends[i + n - 1]) for i in ids]
+
+    def contains(self, term: str, prefix: bool = False) -> bool:
+        return bool(self._match_ids(term, prefix)[0])
+
+    def matches(self, pattern, flags: int = 0, within: Optional[Iterable[Hit]] = None) -> List[Tuple[Hit, PageMatch]]:
+        """(hit, match) d'une regex appliquée au texte replié de chaque page.
+
+        La regex s'écrit donc en minuscules sans accents ; les groupes du match sont lus
+        dans le texte d'origine. `within` restreint la recherche aux pages de ces hits
+        (préfiltre par mot-clé).
+        """
+        rx = re.compile(pattern, flags) if isinstance(pattern, str) else pattern
+        if within is None:
+            pages = range(len(self._pages))
+        else:
+            keys = {(h.file, h.page) for h in within}
+            pages = [i for i, (f, p, _, _, _) in enumerate(self._pages) if (f, p) in keys]
+        out = []
+        for i in pages:
+            _, _, folded, offsets, text = self._pages[i]
+            out.extend((self._hit(i, m.start(), m.end()), PageMatch(m, text, offsets)) for m in rx.finditer(folded))
+        return out
+
+    def search(self, pattern, flags: int = 0) -> List[Hit]:
+        """Occurrences d'une regex appliquée au texte replié de chaque page."""
+        return [hit for hit, _ in self.matches(pattern, flags)]
+
+def text_index(docstore) -> TextIndex:
+    """Index partagé du docstore : construit au premier appel puis réutilisé par tous les agents."""
+    index = docstore.get("index")
+    if index is None:
+        index = TextIndex.from_docstore(docstore)
+        docstore["index"] = index
+    return index
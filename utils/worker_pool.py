@@ -0,0 +1,93 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from utils.metrics import replay_collected, run_collected
+
+
+class PoolSaturated(Exception):
+    """File d'attente pleine : l'appelant doit renvoyer un 503 avec Retry-After."""
+
+
+class BoundedPool:
+    """Exécuteur borné pour sortir le travail CPU (DOCX/XLSX/CSV) de la boucle asyncio.
+
+    `workers` jobs tournent en parallèle, `queue_size` attendent ; au-delà, `run`
+    lève PoolSaturated sans rien mettre en file. Un job qui dépasse `timeout`
+    lève asyncio.TimeoutError côté appelant ; sa place n'est libérée qu'à la fin
+    réelle du job, pour que la contre-pression reflète la charge effective.
+    """
+
+    def __init__(self, mode: str = "thread", workers: int = 0, queue_size: int = 8, timeout: float = 120.0):
+        self.mode = mode
+        self.workers = workers or (os.cpu_count() or 1)
+        self.capacity = self.workers + max(0, queue_size)
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._freed: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_env(cls) -> "BoundedPool":
+        return cls(
+            mode=os.environ.get("WORKER_MODE", "thread"),
+            workers=int(os.environ.get("WORKER_COUNT", "0")),
+            queue_size=int(os.environ.get("WORKER_QUEUE", "8")),
+            timeout=float(os.environ.get("WORKER_TIMEOUT_S", "120")),
+        )
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="marchia-worker")
+        return self._executor
+
+    def _release(self, _fut) -> None:
+        self._pending -= 1
+        if self._freed is not None:
+            self._freed.set()
+            self._freed = None
+
+    async def run(self, fn, *args):
+        if self._pending >= self.capacity:
+            raise PoolSaturated()
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        if self.mode != "process":
+            # le thread voit le contexte de la requête (étapes chronométrées -> Server-Timing)
+            fn, args = contextvars.copy_context().run, (fn, *args)
+        else:
+            # l'enfant renvoie ses étapes et lignes lues avec le résultat ; rejouées ici
+            fn, args = run_collected, (fn, *args)
+        try:
+            fut = loop.run_in_executor(self._get_executor(), fn, *args)
+        except BaseException:
+            self._pending -= 1
+            raise
+        fut.add_done_callback(self._release)
+        result = await asyncio.wait_for(asyncio.shield(fut), timeout=self.timeout)
+        if self.mode == "process":
+            result, timings, rows = result
+            replay_collected(timings, rows)
+        return result
+
+    async def run_waiting(self, fn, *args):
+        """Comme `run`, mais attend qu'une place se libère au lieu de lever PoolSaturated."""
+        while self._pending >= self.capacity:
+            if self._freed is None:
+                self._freed = asyncio.Event()
+            await self._freed.wait()
+        return await self.run(fn, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None